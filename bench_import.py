@@ -0,0 +1,102 @@
+import argparse
+import functools
+import json
+import os
+import random
+import tempfile
+import time
+
+import openpyxl
+import pandas as pd
+
+import importer
+
+FACS = ["ІАТ", "ІПСА", "ФІОТ", "ФПМ", "ФМФ", "ХТФ"]
+
+KPI_AWARDS = [
+    "Грамота Вченої ради",
+    "Почесна грамота Вченої ради",
+    "Почесна відзнака Вченої ради",
+]
+
+STATE_AWARDS = [
+    "Подяка МОН України",
+    "Грамота МОН України",
+]
+
+def make_sheet(url: str, rows: int, extra: int = 4, seed: int = 0):
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(
+        ["№"] + list(importer.COLUMNS) + [f"x{i}" for i in range(extra)]
+    )
+
+    for i in range(rows):
+        kpi = rnd.random() < 0.6
+        year = rnd.randint(2000, 2024)
+        ws.append([
+            i + 1,
+            f"Викладач {rnd.randint(1, rows // 3 + 1)}",
+            rnd.choice(FACS),
+            rnd.choice(KPI_AWARDS) if kpi else None,
+            None if kpi else rnd.choice(STATE_AWARDS),
+            rnd.randint(1, 20),
+            year if kpi else None,
+            None if kpi else year,
+            None,
+        ] + [rnd.random() for _ in range(extra)])
+
+    wb.save(url)
+
+def read_pandas(url: str) -> int:
+    return len(pd.read_excel(url))
+
+def read_engine(url: str, engine: str) -> int:
+    chunks = importer.iter_xlsx(url, engines=[engine])
+
+    return sum(len(df) for df, _, _ in chunks)
+
+def measure(read, url: str, repeat: int) -> dict:
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = read(url)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    return {"rows": rows, "seconds": round(best, 4)}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Порівняння рушіїв читання *.xlsx на синтетичних даних"
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    readers = {"pandas": read_pandas}
+    readers.update({
+        name: functools.partial(read_engine, engine=name) 
+        for name in importer.XLSX_ENGINES
+    })
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            url = os.path.join(tmp, f"awards_{rows}.xlsx")
+            make_sheet(url, rows)
+
+            for name, read in readers.items():
+                try:
+                    result = measure(read, url, args.repeat)
+                except Exception as ex_:
+                    result = {"error": str(ex_)}
+
+                print(json.dumps(
+                    dict(engine=name, size=rows, **result),
+                    ensure_ascii=False
+                ))
+
+if __name__ == "__main__":
+    main()
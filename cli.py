@@ -0,0 +1,138 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from database import DataBase, TeachersQuery, compile_filters
+
+FORMATS = ("xlsx", "csv", "parquet", "feather")
+
+FIELDS = (
+    "teacher", "fac", "gram", "state_gram",
+    "num", "year", "state_year", "prog",
+)
+
+def get_format(url: str, fmt: str = None) -> str:
+    return fmt or os.path.splitext(url)[1].lstrip(".").lower()
+
+def get_filters(args: argparse.Namespace) -> dict:
+    return compile_filters({
+        k: getattr(args, k) for k in FIELDS if getattr(args, k) is not None
+    })
+
+def run_import(db: DataBase, args: argparse.Namespace) -> dict:
+    import importer
+
+    if len(args.file) > 1 or os.path.isdir(args.file[0]):
+        if args.mode == "replace":
+            raise ValueError(
+                "Імпорт кількох файлів або каталогу підтримує лише "
+                "режим sync"
+            )
+
+        return importer.import_files(db, args.file, workers=args.workers)
+
+    return importer.import_file(
+        db,
+        args.file[0],
+        get_format(args.file[0], args.format),
+        mode=args.mode or "replace",
+        chunksize=args.chunksize
+    )
+
+def run_export(db: DataBase, args: argparse.Namespace) -> dict:
+    import exporter
+
+    count = exporter.export_file(
+        db,
+        args.file,
+        get_format(args.file, args.format),
+        get_filters(args)
+    )
+
+    return {"exported": count}
+
+def run_search(db: DataBase, args: argparse.Namespace) -> dict:
+    query = TeachersQuery(db, get_filters(args), snapshot=False)
+    page = query.page()
+    found = page["total"]
+    rows = []
+
+    while True:
+        for el in page["items"]:
+            if args.limit and len(rows) >= args.limit:
+                break
+
+            el.pop("_id", None)
+            rows.append(el)
+
+        if page["token"] is None or args.limit and len(rows) >= args.limit:
+            break
+
+        page = query.page(page["token"])
+
+    return {"found": found, "returned": len(rows), "rows": rows}
+
+def add_filters(parser: argparse.ArgumentParser):
+    for name in FIELDS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name)
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Імпорт, експорт та пошук нагород без "
+                    "графічного інтерфейсу"
+    )
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=27017)
+    parser.add_argument("--db", default="teacher_awards")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imp = commands.add_parser("import")
+    imp.add_argument("file", nargs="+")
+    imp.add_argument("--format", choices=FORMATS)
+    imp.add_argument(
+        "--mode", 
+        choices=("replace", "sync"),
+        help="replace (типово) для одного файлу; кілька файлів або "
+             "каталог завжди імпортуються як sync"
+    )
+    imp.add_argument("--chunksize", type=int)
+    imp.add_argument("--workers", type=int)
+    imp.set_defaults(run=run_import)
+
+    exp = commands.add_parser("export")
+    exp.add_argument("file")
+    exp.add_argument("--format", choices=FORMATS)
+    add_filters(exp)
+    exp.set_defaults(run=run_export)
+
+    search = commands.add_parser("search")
+    search.add_argument("--limit", type=int, default=100)
+    add_filters(search)
+    search.set_defaults(run=run_search)
+
+    return parser
+
+def main(argv: list = None) -> int:
+    args = get_parser().parse_args(argv)
+    start = time.perf_counter()
+    report = {"command": args.command}
+
+    try:
+        db = DataBase(args.host, args.port, args.db)
+        report.update(args.run(db, args))
+        code = 0
+    except Exception as ex_:
+        logging.error(ex_)
+        report["error"] = str(ex_)
+        code = 1
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(report, ensure_ascii=False, default=str))
+
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import typing
+
+FORMATS = ("parquet", "feather")
+
+COMPRESSION = "zstd"
+
+FIELDS = (
+    ("teacher", "string"),
+    ("fac", "string"),
+    ("gram", "string"),
+    ("state_gram", "string"),
+    ("num", "string"),
+    ("year", "int16"),
+    ("state_year", "int16"),
+    ("prog", "string"),
+)
+
+def load():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "Для роботи з форматами Parquet/Feather "
+            "потрібно встановити пакет pyarrow"
+        )
+
+    return pyarrow
+
+def schema(pa):
+    return pa.schema([(name, getattr(pa, kind)()) for name, kind in FIELDS])
+
+def to_batch(pa, rows: typing.List[dict]):
+    return pa.RecordBatch.from_pydict(
+        {name: [el.get(name) for el in rows] for name, _ in FIELDS},
+        schema=schema(pa)
+    )
+
+def write(
+    url: str,
+    fmt: str,
+    batches: typing.Iterable[typing.List[dict]]
+) -> int:
+    pa = load()
+    count = 0
+
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(
+            url,
+            schema(pa),
+            compression=COMPRESSION
+        )
+    elif fmt == "feather":
+        writer = pa.ipc.new_file(
+            url,
+            schema(pa),
+            options=pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+        )
+    else:
+        raise ValueError("Can't parse file (no such format)")
+
+    with writer:
+        for rows in batches:
+            if rows:
+                writer.write_batch(to_batch(pa, rows))
+                count += len(rows)
+
+    return count
+
+def iter_record_batches(
+    pa, 
+    url: str, 
+    fmt: str, 
+    chunksize: int
+) -> typing.Iterator[typing.Tuple[typing.Any, int, int]]:
+    columns = [name for name, _ in FIELDS]
+
+    if fmt == "parquet":
+        file = pa.parquet.ParquetFile(url)
+        total = file.metadata.num_rows
+        done = 0
+
+        for batch in file.iter_batches(batch_size=chunksize, columns=columns):
+            done += batch.num_rows
+            yield batch, done, total
+    elif fmt == "feather":
+        with pa.memory_map(url) as source:
+            reader = pa.ipc.open_file(source)
+            total = reader.num_record_batches
+
+            for i in range(total):
+                yield reader.get_batch(i).select(columns), i + 1, total
+    else:
+        raise ValueError("Can't parse file (no such format)")
+
+def iter_batches(
+    url: str,
+    fmt: str,
+    chunksize: int
+) -> typing.Iterator[typing.Tuple[typing.Any, int, int]]:
+    pa = load()
+
+    for batch, done, total in iter_record_batches(pa, url, fmt, chunksize):
+        yield batch.to_pandas(), done, total
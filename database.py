@@ -0,0 +1,1639 @@
+import base64
+import bson
+import collections
+import itertools
+import json
+import logging
+import pymongo
+import re
+import threading
+import time
+import typing
+
+from forecast import ForecastEngine, successors
+from names import NameIndex
+from pymongo.collation import Collation
+
+COLLATION = Collation(locale="uk", strength=2)
+
+SCHEMA_VERSION = 2
+
+EMPTY = (None, "", "nan")
+
+YEAR_RE = re.compile(r"^\d{4}$")
+
+QUOTES_RE = re.compile("(`|'|\")")
+
+def to_year(value) -> typing.Union[int, None]:
+    if value in EMPTY:
+        return None
+
+    if isinstance(value, int):
+        return value
+
+    value = str(value).strip()
+
+    try:
+        year = int(float(value))
+    except ValueError:
+        raise ValueError(f"Некоректний рік: {value}")
+
+    if not YEAR_RE.match(str(year)):
+        raise ValueError(f"Некоректний рік: {value}")
+
+    return year
+
+def to_award_id(value, catalog: dict, message: str) -> typing.Union[int, None]:
+    if value in EMPTY:
+        return None
+
+    if isinstance(value, int):
+        return value
+
+    value = QUOTES_RE.sub("'", str(value).strip())
+
+    if value not in catalog:
+        raise ValueError(f"{message}: {value}")
+
+    return catalog[value]
+
+def to_award_name(value, by_id: dict) -> typing.Union[str, None]:
+    if value in EMPTY:
+        return None
+
+    if isinstance(value, int):
+        return by_id.get(value)
+
+    return value
+
+def encode(doc: dict, refs: dict) -> dict:
+    gram = to_award_id(
+        doc.get("gram"), 
+        refs["kpi_awards"], 
+        "У КПІ не існує такої нагороди"
+    )
+    state_gram = to_award_id(
+        doc.get("state_gram"), 
+        refs["state_awards"], 
+        "Не існує такої державної нагороди"
+    )
+    catalog = refs["kpi_awards" if gram is not None else "state_awards"]
+
+    prog = doc.get("prog")
+    if prog in EMPTY:
+        prog = None
+    elif not isinstance(prog, int):
+        prog = catalog.get(QUOTES_RE.sub("'", str(prog).strip()))
+
+    num = doc.get("num")
+
+    return {
+        "fac": doc["fac"],
+        "teacher": doc["teacher"],
+        "gram": gram,
+        "state_gram": state_gram,
+        "num": None if num in EMPTY else str(num).strip(),
+        "year": to_year(doc.get("year")),
+        "state_year": to_year(doc.get("state_year")),
+        "prog": prog,
+    }
+
+def summary_key(doc: dict) -> typing.Tuple[str, str]:
+    if doc.get("gram") not in EMPTY:
+        year, award = doc.get("year"), f"kpi_{doc['gram']}"
+    else:
+        year, award = doc.get("state_year"), f"state_{doc.get('state_gram')}"
+
+    return ("none" if year in EMPTY else str(year)), award
+
+def add_summary(
+    deltas: typing.Dict[str, collections.Counter],
+    doc: dict,
+    sign: int = 1
+):
+    year, award = summary_key(doc)
+    delta = deltas[doc.get("fac")]
+
+    delta["total"] += sign
+    delta[f"years.{year}"] += sign
+    delta[f"awards.{award}"] += sign
+
+def award_order(row: dict) -> tuple:
+    return row["kind"], -row["count"], str(row["award"])
+
+def decode(doc: dict, refs: dict) -> dict:
+    kpi = doc.get("gram") not in EMPTY
+    by_id = refs["kpi_awards_by_id" if kpi else "state_awards_by_id"]
+    num = doc.get("num")
+    years = {}
+
+    for k in ("year", "state_year"):
+        try:
+            years[k] = to_year(doc.get(k))
+        except ValueError:
+            years[k] = None
+
+    return {
+        "_id": doc.get("_id"),
+        "fac": doc.get("fac"),
+        "teacher": doc.get("teacher"),
+        "gram": to_award_name(doc.get("gram"), refs["kpi_awards_by_id"]),
+        "state_gram": to_award_name(
+            doc.get("state_gram"), 
+            refs["state_awards_by_id"]
+        ),
+        "num": None if num in EMPTY else num,
+        "year": years["year"],
+        "state_year": years["state_year"],
+        "prog": to_award_name(doc.get("prog"), by_id),
+    }
+
+def compile_year(value: str) -> typing.Union[int, dict]:
+    if "-" in value:
+        start, end = (el.strip() for el in value.split("-", 1))
+        query = {}
+
+        if start:
+            query["$gte"] = compile_year(start)
+        if end:
+            query["$lte"] = compile_year(end)
+        if not query:
+            raise ValueError(f"Некоректний рік: {value}")
+
+        return query
+
+    if "," in value:
+        return {"$in": [compile_year(el.strip()) for el in value.split(",")]}
+
+    if not YEAR_RE.match(value):
+        raise ValueError(f"Некоректний рік: {value}")
+
+    return int(value)
+
+def compile_filters(form: dict) -> dict:
+    filters = {}
+
+    for k, v in form.items():
+        v = v.strip()
+
+        if not v:
+            continue
+
+        if k in ("year", "state_year"):
+            filters[k] = compile_year(v)
+        elif k == "teacher":
+            filters[k] = {"$gte": v, "$lt": v + "\uffff"}
+        elif k == "fac" and "," in v:
+            filters[k] = {
+                "$in": [el.strip() for el in v.split(",") if el.strip()]
+            }
+        elif k in ("gram", "state_gram", "prog"):
+            filters[k] = QUOTES_RE.sub("'", v)
+        else:
+            filters[k] = v
+
+    return filters
+
+def fold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+def match_value(cond, value) -> bool:
+    if not isinstance(cond, dict):
+        return fold(value) == fold(cond)
+
+    value = fold(value)
+
+    try:
+        for op, arg in cond.items():
+            if op == "$in":
+                ok = value in [fold(el) for el in arg]
+            elif op == "$gte":
+                ok = value is not None and value >= fold(arg)
+            elif op == "$lte":
+                ok = value is not None and value <= fold(arg)
+            elif op == "$lt":
+                ok = value is not None and value < fold(arg)
+            else:
+                raise ValueError(f"Unsupported operator: {op}")
+
+            if not ok:
+                return False
+    except TypeError:
+        return False
+
+    return True
+
+def match_filters(filters: dict, doc: dict) -> bool:
+    return all(match_value(v, doc.get(k)) for k, v in filters.items())
+
+def is_refinement(old: dict, new: dict) -> bool:
+    for k, v in old.items():
+        if k not in new:
+            return False
+
+        if k == "teacher":
+            if not new[k].casefold().startswith(v.casefold()):
+                return False
+        elif new[k] != v:
+            return False
+
+    return True
+
+class ImportLocked(Exception):
+    pass
+
+class SchemaOutdated(Exception):
+    pass
+
+class DataBase:
+    REFS_CHECK_INTERVAL = 30.0
+    REFS_COLLECTIONS = ("facs", "kpi_awards", "state_awards")
+    BATCH_SIZE = 1000
+    PAGE_SIZE = 100
+    COUNT_TIMEOUT_MS = 2000
+    SERVER_TIMEOUT_MS = 5000
+    CACHE_SIZE = 128
+    KEY_FIELDS = ("fac", "teacher", "year", "state_year")
+    STAGING_COLLECTION = "teachers_staging"
+    IMPORT_LOCK_TIMEOUT_S = 600.0
+    FORECASTS_COLLECTION = "forecasts"
+    SUMMARY_COLLECTION = "faculty_summary"
+    BACKUP_COLLECTION = "teachers_backup"
+    TEACHER_INDEXES = (
+        (("fac", 1), ("teacher", 1), ("year", 1)),
+        (("fac", 1), ("teacher", 1), ("state_year", 1)),
+        (("fac", 1), ("year", 1)),
+        (("fac", 1), ("state_year", 1)),
+        (("teacher", 1), ("_id", 1)),
+        (("year", 1),),
+        (("state_year", 1),),
+        (("gram", 1), ("year", 1)),
+        (("state_gram", 1), ("state_year", 1)),
+    )
+
+    def __init__(
+        self, 
+        host: str, 
+        port: int, 
+        dbname: str, 
+        user: str = None,
+        password: str = None
+    ):
+        url = "mongodb://"
+        
+        if user and password:
+            url += f"{user}:{password}@"
+        
+        url += f"{host}:{port}/{dbname}"
+        self.__client = pymongo.MongoClient(
+            url, 
+            serverSelectionTimeoutMS=self.SERVER_TIMEOUT_MS
+        )
+        self.__db = self.__client[dbname]
+
+        self.__refs = None
+        self.__refs_stamp = None
+        self.__refs_checked = 0.0
+        self.__refs_lock = threading.Lock()
+
+        self.__cache = collections.OrderedDict()
+        self.__cache_lock = threading.Lock()
+        self.__cache_hits = 0
+        self.__cache_misses = 0
+        self.__cache_version = None
+
+        self.__names = None
+        self.__names_lock = threading.Lock()
+
+    def __refs_version(self):
+        try:
+            ans = self.__db.command(
+                "dbHash", 
+                collections=list(self.REFS_COLLECTIONS)
+            )
+            return ans["md5"]
+        except pymongo.errors.OperationFailure:
+            return tuple(
+                self.__db[name].estimated_document_count()
+                for name in self.REFS_COLLECTIONS
+            )
+
+    def __load_refs(self) -> dict:
+        refs = {
+            "facs": {
+                el["name"] for el in self.__db.facs.find({}, {"name": 1})
+            }
+        }
+
+        for name in ("kpi_awards", "state_awards"):
+            catalog = list(
+                self.__db[name].find({}, {"name": 1, "id": 1, "next": 1})
+            )
+            by_name = {el["name"]: int(el["id"]) for el in catalog}
+            by_id = {v: k for k, v in by_name.items()}
+            succ = successors(catalog)
+
+            refs[name] = by_name
+            refs[f"{name}_by_id"] = by_id
+            refs[f"{name}_succ"] = succ
+            refs[f"{name}_next"] = {
+                k: by_id[succ[v]] for k, v in by_name.items() 
+                if succ.get(v) in by_id
+            }
+
+        return refs
+
+    def get_refs(self) -> dict:
+        with self.__refs_lock:
+            now = time.monotonic()
+
+            if (self.__refs is None or 
+                now - self.__refs_checked >= self.REFS_CHECK_INTERVAL):
+                stamp = self.__refs_version()
+
+                if self.__refs is None or stamp != self.__refs_stamp:
+                    self.__refs = self.__load_refs()
+                    self.__refs_stamp = stamp
+
+                self.__refs_checked = now
+
+            return self.__refs
+
+    def warm_up(self) -> dict:
+        self.__client.admin.command("ping")
+        self.get_refs()
+        self.ensure_indexes()
+
+        if self.SUMMARY_COLLECTION not in self.__db.list_collection_names():
+            self.rebuild_summary()
+
+        return {"schema": self.schema_version(), "version": self.version()}
+
+    def reload_refs(self):
+        self.__refs = None
+
+    def ensure_indexes(self, collection=None):
+        if collection is None:
+            collection = self.__db.teachers
+
+        try:
+            collection.create_indexes([
+                pymongo.IndexModel(
+                    list(keys), 
+                    name="_".join(f"{k}_{v}" for k, v in keys) + "_uk",
+                    collation=COLLATION
+                ) 
+                for keys in self.TEACHER_INDEXES
+            ])
+        except Exception as ex_:
+            logging.error(ex_)
+
+    def index_usage(self) -> typing.List[dict]:
+        return [
+            {
+                "name": el["name"],
+                "key": dict(el["key"]),
+                "ops": el["accesses"]["ops"],
+                "since": el["accesses"]["since"],
+            }
+            for el in self.__db.teachers.aggregate([{"$indexStats": {}}])
+        ]
+
+    def drop_index(self, name: str):
+        self.__db.teachers.drop_index(name)
+
+    def __award_ids(self, cond, catalog: dict):
+        catalog = {k.casefold(): v for k, v in catalog.items()}
+
+        if isinstance(cond, dict):
+            return {
+                op: [catalog.get(fold(el), -1) for el in arg] 
+                if isinstance(arg, list) else catalog.get(fold(arg), -1)
+                for op, arg in cond.items()
+            }
+
+        return catalog.get(fold(cond), -1)
+
+    def __to_query(self, filters: dict) -> dict:
+        if not filters:
+            return {}
+
+        refs = self.get_refs()
+        query = dict(filters)
+
+        for k in ("gram", "state_gram"):
+            if k in query:
+                catalog = "kpi_awards" if k == "gram" else "state_awards"
+                query[k] = self.__award_ids(query[k], refs[catalog])
+
+        if "prog" in query:
+            prog = query.pop("prog")
+            query["$or"] = [
+                {
+                    "gram": {"$ne": None}, 
+                    "prog": self.__award_ids(prog, refs["kpi_awards"])
+                },
+                {
+                    "gram": None, 
+                    "prog": self.__award_ids(prog, refs["state_awards"])
+                },
+            ]
+
+        return query
+
+    def get_teachers(self, filters: dict = None):
+        try:
+            refs = self.get_refs()
+
+            if filters:
+                elmnts = self.__db.teachers.find(
+                    self.__to_query(filters), 
+                    collation=COLLATION
+                )
+            else:
+                elmnts = self.__db.teachers.find()
+        except Exception as ex_:
+            logging.error(ex_)
+            return None
+
+        return (decode(el, refs) for el in elmnts)
+
+    def iter_teacher_batches(
+        self, 
+        filters: dict = None,
+        fields: typing.Iterable[str] = None,
+        batch_size: int = BATCH_SIZE
+    ) -> typing.Iterator[typing.List[dict]]:
+        refs = self.get_refs()
+        projection = {"_id": 0}
+
+        if fields is not None:
+            projection.update({k: 1 for k in fields})
+            projection.update(gram=1, state_gram=1)
+
+        cursor = self.__db.teachers.find(
+            self.__to_query(filters), 
+            projection,
+            collation=COLLATION
+        ).batch_size(batch_size)
+
+        while True:
+            batch = list(itertools.islice(cursor, batch_size))
+            if not batch:
+                break
+
+            yield [decode(el, refs) for el in batch]
+
+    def __encode_token(self, value, last_id, total) -> str:
+        raw = json.dumps([value, str(last_id), total])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def __decode_token(self, token: str) -> tuple:
+        value, last_id, total = json.loads(base64.urlsafe_b64decode(token))
+        return value, bson.ObjectId(last_id), total
+
+    def __count_teachers(self, filters: dict = None):
+        try:
+            if not filters:
+                return self.__db.teachers.estimated_document_count()
+
+            return self.__db.teachers.count_documents(
+                filters, 
+                maxTimeMS=self.COUNT_TIMEOUT_MS,
+                collation=COLLATION
+            )
+        except Exception as ex_:
+            logging.info(ex_)
+            return None
+
+    def cache_stats(self) -> dict:
+        with self.__cache_lock:
+            return {
+                "hits": self.__cache_hits,
+                "misses": self.__cache_misses,
+                "size": len(self.__cache),
+            }
+
+    def __cache_get(self, key):
+        with self.__cache_lock:
+            value = self.__cache.get(key)
+
+            if value is None:
+                self.__cache_misses += 1
+            else:
+                self.__cache.move_to_end(key)
+                self.__cache_hits += 1
+
+            return value
+
+    def __cache_put(self, key, value):
+        with self.__cache_lock:
+            self.__cache[key] = value
+
+            while len(self.__cache) > self.CACHE_SIZE:
+                self.__cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self.__cache_lock:
+            self.__cache.clear()
+
+    def __touch(self):
+        self.clear_cache()
+
+        try:
+            ans = self.__db.meta.find_one_and_update(
+                {"_id": "teachers"}, 
+                {"$inc": {"version": 1}}, 
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            with self.__cache_lock:
+                self.__cache_version = ans["version"]
+
+    def version(self) -> int:
+        ans = self.__db.meta.find_one({"_id": "teachers"}, {"version": 1})
+        version = ans["version"] if ans else 0
+
+        with self.__cache_lock:
+            if version != self.__cache_version:
+                if self.__cache_version is not None:
+                    self.__set_names(None)
+
+                self.__cache.clear()
+                self.__cache_version = version
+
+        return version
+
+    def __set_names(self, index: typing.Union[NameIndex, None]):
+        with self.__names_lock:
+            self.__names = index
+
+    def __add_names(self, names: typing.Iterable[str]):
+        with self.__names_lock:
+            if self.__names is not None:
+                self.__names.add(names)
+
+    def name_index(self) -> NameIndex:
+        with self.__names_lock:
+            if self.__names is None:
+                self.__names = NameIndex(
+                    self.__db.teachers.distinct("teacher")
+                )
+
+            return self.__names
+
+    def find_teacher_names(
+        self, 
+        query: str, 
+        limit: int = 10
+    ) -> typing.List[typing.Tuple[str, float]]:
+        return self.name_index().search(query, limit)
+
+    def get_teachers_page(
+        self, 
+        filters: dict = None,
+        page_size: int = PAGE_SIZE,
+        sort: str = "teacher",
+        descending: bool = False,
+        token: str = None
+    ) -> dict:
+        key = (
+            json.dumps(filters or {}, sort_keys=True, default=str),
+            page_size, 
+            sort, 
+            descending, 
+            token
+        )
+        page = self.__cache_get(key)
+
+        if page is None:
+            page = self.__find_page(
+                self.__to_query(filters), 
+                page_size, 
+                sort, 
+                descending, 
+                token
+            )
+            self.__cache_put(key, page)
+
+        return dict(page, items=list(page["items"]))
+
+    def __find_page(
+        self, 
+        filters: dict,
+        page_size: int,
+        sort: str,
+        descending: bool,
+        token: str
+    ) -> dict:
+        query = dict(filters or {})
+        direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+
+        if token:
+            value, last_id, total = self.__decode_token(token)
+            op = "$lt" if descending else "$gt"
+
+            if value is None and descending:
+                after = {sort: None, "_id": {op: last_id}}
+            elif value is None:
+                after = {"$or": [
+                    {sort: {"$ne": None}},
+                    {sort: None, "_id": {op: last_id}},
+                ]}
+            else:
+                after = {"$or": [
+                    {sort: {op: value}},
+                    {sort: value, "_id": {op: last_id}},
+                ]}
+
+                if descending:
+                    after["$or"].append({sort: None})
+
+            query = {"$and": [query, after]} if query else after
+        else:
+            total = self.__count_teachers(filters)
+
+        items = list(
+            self.__db.teachers.find(query, collation=COLLATION)
+            .sort([(sort, direction), ("_id", direction)])
+            .limit(page_size + 1)
+        )
+
+        if len(items) > page_size:
+            items = items[:page_size]
+            last = items[-1]
+            token = self.__encode_token(last.get(sort), last["_id"], total)
+        else:
+            token = None
+
+        refs = self.get_refs()
+
+        return {
+            "items": [decode(el, refs) for el in items], 
+            "token": token, 
+            "total": total
+        }
+
+    def __apply_summary(self, deltas: typing.Dict[str, collections.Counter]):
+        ops = []
+
+        for fac, delta in deltas.items():
+            inc = {k: v for k, v in delta.items() if v}
+
+            if inc:
+                ops.append(pymongo.UpdateOne(
+                    {"_id": fac}, 
+                    {"$inc": inc}, 
+                    upsert=True
+                ))
+
+        for i in range(0, len(ops), self.BATCH_SIZE):
+            self.__db[self.SUMMARY_COLLECTION].bulk_write(
+                ops[i:i + self.BATCH_SIZE], 
+                ordered=False
+            )
+
+    def rebuild_summary(self) -> int:
+        deltas = collections.defaultdict(collections.Counter)
+        groups = self.__db.teachers.aggregate([
+            {"$group": {
+                "_id": {
+                    "fac": "$fac",
+                    "gram": "$gram",
+                    "state_gram": "$state_gram",
+                    "year": "$year",
+                    "state_year": "$state_year",
+                },
+                "count": {"$sum": 1},
+            }},
+        ], allowDiskUse=True)
+
+        for el in groups:
+            add_summary(deltas, el["_id"], el["count"])
+
+        self.__db[self.SUMMARY_COLLECTION].drop()
+        self.__apply_summary(deltas)
+        self.clear_cache()
+
+        return len(deltas)
+
+    def __repair_summary(self):
+        try:
+            self.rebuild_summary()
+        except Exception as ex_:
+            logging.error(ex_)
+
+    def __summary_stats(self, filters: dict) -> dict:
+        refs = self.get_refs()
+        names = {"kpi": refs["kpi_awards_by_id"], 
+                 "state": refs["state_awards_by_id"]}
+        query = {"_id": filters["fac"]} if "fac" in filters else {}
+        by_fac, by_year, by_award = [], collections.Counter(), {}
+
+        for el in self.__db[self.SUMMARY_COLLECTION].find(
+            query, 
+            collation=COLLATION
+        ):
+            if not el.get("total"):
+                continue
+
+            by_fac.append({"fac": el["_id"], "count": el["total"]})
+
+            for year, count in el.get("years", {}).items():
+                by_year[None if year == "none" else int(year)] += count
+
+            for award, count in el.get("awards", {}).items():
+                kind, award_id = award.split("_", 1)
+                award_id = None if award_id == "None" else (
+                    int(award_id) if award_id.isdigit() else award_id
+                )
+                row = by_award.setdefault(
+                    award, 
+                    {
+                        "award": to_award_name(award_id, names[kind]), 
+                        "kind": kind, 
+                        "count": 0
+                    }
+                )
+                row["count"] += count
+
+        by_fac.sort(key=lambda el: el["fac"])
+        awards = [el for el in by_award.values() if el["count"]]
+        awards.sort(key=award_order)
+
+        return {
+            "total": sum(el["count"] for el in by_fac),
+            "by_fac": by_fac,
+            "by_year": [
+                {"year": year, "count": count} 
+                for year, count in sorted(
+                    by_year.items(), 
+                    key=lambda el: (el[0] is None, el[0] or 0)
+                ) 
+                if count
+            ],
+            "by_award": awards,
+        }
+
+    def get_stats(self, filters: dict = None) -> dict:
+        self.version()
+
+        key = ("stats", json.dumps(filters or {}, sort_keys=True, default=str))
+        stats = self.__cache_get(key)
+
+        if stats is None:
+            if set(filters or {}) <= {"fac"}:
+                stats = self.__summary_stats(filters or {})
+            else:
+                stats = self.__aggregate_stats(self.__to_query(filters))
+
+            self.__cache_put(key, stats)
+
+        return {k: list(v) if isinstance(v, list) else v 
+                for k, v in stats.items()}
+
+    def __aggregate_stats(self, query: dict) -> dict:
+        order = [{"$sort": {"_id": 1}}]
+        ans = next(self.__db.teachers.aggregate([
+            {"$match": query},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "by_fac": [
+                    {"$group": {"_id": "$fac", "count": {"$sum": 1}}},
+                ] + order,
+                "by_year": [
+                    {"$group": {
+                        "_id": {"$ifNull": ["$year", "$state_year"]}, 
+                        "count": {"$sum": 1}
+                    }},
+                ] + order,
+                "by_award": [
+                    {"$group": {
+                        "_id": {
+                            "gram": "$gram", 
+                            "state_gram": "$state_gram"
+                        }, 
+                        "count": {"$sum": 1}
+                    }},
+                ],
+            }},
+        ], allowDiskUse=True, collation=COLLATION), None) or {}
+        refs = self.get_refs()
+        awards = []
+
+        for el in ans.get("by_award", []):
+            gram = el["_id"].get("gram")
+
+            if gram is not None:
+                kind = "kpi"
+                name = to_award_name(gram, refs["kpi_awards_by_id"])
+            else:
+                kind = "state"
+                name = to_award_name(
+                    el["_id"].get("state_gram"), 
+                    refs["state_awards_by_id"]
+                )
+
+            awards.append({"award": name, "kind": kind, "count": el["count"]})
+
+        awards.sort(key=award_order)
+        total = ans.get("total")
+
+        return {
+            "total": total[0]["count"] if total else 0,
+            "by_fac": [
+                {"fac": el["_id"], "count": el["count"]} 
+                for el in ans.get("by_fac", [])
+            ],
+            "by_year": [
+                {"year": el["_id"], "count": el["count"]} 
+                for el in ans.get("by_year", [])
+            ],
+            "by_award": awards,
+        }
+
+    def set_teacher(self, data: dict) -> typing.Union[str, None]:
+        self.__require_schema()
+        data = encode(data, self.get_refs())
+        years = [
+            el for el in (data["year"], data["state_year"]) if el is not None
+        ]
+        ans = self.__db.teachers.find_one({
+            "fac": data["fac"],
+            "teacher": data["teacher"],
+            "$or": [
+                {"year": {"$in": years}},
+                {"state_year": {"$in": years}},
+            ]
+        }, collation=COLLATION)
+
+        if ans:
+            raise Exception(
+                "Помилка: викладач вже отримав нагороду у вказаному році"
+            )
+
+        deltas = collections.defaultdict(collections.Counter)
+        add_summary(deltas, data)
+
+        try:
+            self.__drop_backup()
+            self.__db.teachers.insert_one(data)
+            self.__apply_summary(deltas)
+            self.recompute_forecasts([(data["fac"], data["teacher"])])
+        except Exception as ex_:
+            logging.error(ex_)
+            self.__repair_summary()
+        else:
+            self.__add_names([data["teacher"]])
+
+        self.__touch()
+
+    def __entry_keys(self, doc: dict) -> typing.List[tuple]:
+        return [
+            (fold(doc["fac"]), fold(doc["teacher"]), year) 
+            for year in (doc.get("year"), doc.get("state_year")) 
+            if year is not None
+        ]
+
+    def __entry_query(self, doc: dict) -> dict:
+        years = [el[2] for el in self.__entry_keys(doc)]
+
+        return {
+            "fac": doc["fac"],
+            "teacher": doc["teacher"],
+            "$or": [
+                {"year": {"$in": years}},
+                {"state_year": {"$in": years}},
+            ],
+        }
+
+    def set_teachers(self, data: typing.List[dict]) -> typing.List[dict]:
+        self.__require_schema()
+        refs = self.get_refs()
+        statuses = [
+            {"row": i, "status": None, "message": ""} 
+            for i in range(len(data))
+        ]
+        rows = {}
+
+        for i, el in enumerate(data):
+            try:
+                rows[i] = encode(el, refs)
+            except ValueError as ex_:
+                statuses[i].update(status="invalid", message=str(ex_))
+
+        if rows:
+            taken = set()
+            found = self.__db.teachers.find(
+                {"$or": [self.__entry_query(el) for el in rows.values()]},
+                {"fac": 1, "teacher": 1, "year": 1, "state_year": 1},
+                collation=COLLATION
+            )
+
+            for el in found:
+                taken.update(self.__entry_keys(el))
+
+            for i, doc in list(rows.items()):
+                if taken.intersection(self.__entry_keys(doc)):
+                    statuses[i].update(
+                        status="duplicate",
+                        message="Помилка: викладач вже отримав нагороду "
+                                "у вказаному році"
+                    )
+                    del rows[i]
+
+        order = list(rows)
+        inserted = order
+
+        try:
+            if order:
+                self.__drop_backup()
+                self.__db.teachers.bulk_write(
+                    [pymongo.InsertOne(rows[i]) for i in order], 
+                    ordered=True
+                )
+        except pymongo.errors.BulkWriteError as ex_:
+            logging.error(ex_)
+            inserted = order[:ex_.details.get("nInserted", 0)]
+            errors = ex_.details.get("writeErrors", [])
+
+            for j, i in enumerate(order[len(inserted):]):
+                if j == 0 and errors:
+                    statuses[i].update(
+                        status="failed", 
+                        message=f"Помилка: {errors[0].get('errmsg', '')}"
+                    )
+                else:
+                    statuses[i].update(
+                        status="skipped",
+                        message="Не внесено через попередню помилку"
+                    )
+
+        for i in inserted:
+            statuses[i].update(status="inserted", message="Дані були внесені")
+
+        if inserted:
+            deltas = collections.defaultdict(collections.Counter)
+
+            try:
+                for i in inserted:
+                    add_summary(deltas, rows[i])
+
+                self.__apply_summary(deltas)
+                self.recompute_forecasts(
+                    (rows[i]["fac"], rows[i]["teacher"]) for i in inserted
+                )
+            except Exception as ex_:
+                logging.error(ex_)
+                self.__repair_summary()
+
+            self.__add_names(rows[i]["teacher"] for i in inserted)
+            self.__touch()
+
+        return statuses
+
+    def __copy_indexes(self, source, target):
+        for name, info in source.index_information().items():
+            if name == "_id_":
+                continue
+
+            options = {
+                k: v for k, v in info.items() if k not in ("v", "key", "ns")
+            }
+            target.create_index(info["key"], name=name, **options)
+
+    def set_and_rm_teachers(
+        self, 
+        data: typing.Iterable[dict], 
+        keep_backup: bool = True
+    ) -> int:
+        lock = self.__lock_import()
+        staging = self.__db[f"{self.STAGING_COLLECTION}_{lock}"]
+        refs = self.get_refs()
+        data = (encode(el, refs) for el in data)
+        deltas = collections.defaultdict(collections.Counter)
+        groups = {}
+        names = set()
+        count = 0
+        forecasts = self.__db[f"{staging.name}_forecasts"]
+
+        try:
+            staging = self.__db.create_collection(staging.name)
+
+            while True:
+                batch = list(itertools.islice(data, self.BATCH_SIZE))
+                if not batch:
+                    break
+
+                self.__refresh_lock(lock)
+
+                staging.bulk_write(
+                    [pymongo.InsertOne(el) for el in batch],
+                    ordered=False
+                )
+                names.update(el["teacher"] for el in batch)
+
+                for el in batch:
+                    add_summary(deltas, el)
+                    key = (fold(el["fac"]), fold(el["teacher"]))
+                    groups.setdefault(
+                        key, 
+                        (el["fac"], el["teacher"], [])
+                    )[2].append({
+                        k: el.get(k) for k in (
+                            "gram", "state_gram", "year", "state_year", "prog"
+                        )
+                    })
+
+                count += len(batch)
+
+            self.__copy_indexes(self.__db.teachers, staging)
+            self.ensure_indexes(staging)
+            self.__stage_forecasts(staging, forecasts, groups)
+
+            if (keep_backup and 
+                "teachers" in self.__db.list_collection_names()):
+                self.__db.teachers.aggregate([
+                    {"$match": {}},
+                    {"$out": self.BACKUP_COLLECTION}
+                ])
+                self.__db.meta.update_one(
+                    {"_id": "schema_backup"}, 
+                    {"$set": {"version": self.schema_version()}}, 
+                    upsert=True
+                )
+
+            staging.rename("teachers", dropTarget=True)
+            forecasts.rename(self.FORECASTS_COLLECTION, dropTarget=True)
+            self.__db[self.SUMMARY_COLLECTION].drop()
+            self.__apply_summary(deltas)
+            self.__db.meta.update_one(
+                {"_id": "schema"}, 
+                {"$set": {"version": SCHEMA_VERSION}}, 
+                upsert=True
+            )
+            self.__set_names(NameIndex(names))
+        except Exception as ex_:
+            logging.error(ex_)
+            staging.drop()
+            forecasts.drop()
+            raise
+        finally:
+            self.__unlock_import(lock)
+            self.__touch()
+
+        return count
+
+    def __lock_import(self) -> str:
+        lock = str(bson.ObjectId())
+        now = time.time()
+
+        try:
+            self.__db.meta.update_one(
+                {"_id": "import_lock", 
+                 "at": {"$lt": now - self.IMPORT_LOCK_TIMEOUT_S}},
+                {"$set": {"lock": lock, "at": now}},
+                upsert=True
+            )
+        except pymongo.errors.DuplicateKeyError:
+            raise ImportLocked(
+                "Помилка: вже виконується інший повний імпорт або відкат"
+            )
+
+        prefix = f"{self.STAGING_COLLECTION}_"
+
+        for name in self.__db.list_collection_names():
+            if name.startswith(prefix):
+                self.__db[name].drop()
+
+        return lock
+
+    def __refresh_lock(self, lock: str):
+        ans = self.__db.meta.update_one(
+            {"_id": "import_lock", "lock": lock},
+            {"$set": {"at": time.time()}}
+        )
+
+        if ans.matched_count == 0:
+            raise ImportLocked("Помилка: блокування імпорту втрачено")
+
+    def __unlock_import(self, lock: str):
+        try:
+            self.__db.meta.delete_one({"_id": "import_lock", "lock": lock})
+        except Exception as ex_:
+            logging.error(ex_)
+
+    def __drop_backup(self):
+        self.__db[self.BACKUP_COLLECTION].drop()
+        self.__db.meta.delete_one({"_id": "schema_backup"})
+
+    def rollback_teachers(self):
+        lock = self.__lock_import()
+
+        try:
+            if (self.BACKUP_COLLECTION not in 
+                self.__db.list_collection_names()):
+                raise Exception("Помилка: немає попередньої версії даних")
+
+            backup = self.__db.meta.find_one({"_id": "schema_backup"})
+
+            self.__db[self.BACKUP_COLLECTION].rename(
+                "teachers", 
+                dropTarget=True
+            )
+            self.__db.meta.update_one(
+                {"_id": "schema"}, 
+                {"$set": {"version": backup["version"] if backup else 1}}, 
+                upsert=True
+            )
+            self.__db.meta.delete_one({"_id": "schema_backup"})
+            self.__set_names(None)
+
+            try:
+                self.ensure_indexes()
+                self.rebuild_summary()
+                self.rebuild_forecasts()
+            finally:
+                self.__touch()
+        finally:
+            self.__unlock_import(lock)
+
+    def __flush(self, ops: list):
+        if ops:
+            self.__db.teachers.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    def sync_teachers(
+        self, 
+        data: typing.Iterable[dict], 
+        scope: typing.Iterable[str] = None
+    ) -> dict:
+        self.__require_schema()
+        counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        refs = self.get_refs()
+        data = (encode(el, refs) for el in data)
+        current = {}
+        stale = []
+        names = []
+        affected = set()
+        deltas = collections.defaultdict(collections.Counter)
+
+        query = {} if scope is None else {"fac": {"$in": list(scope)}}
+
+        try:
+            for el in self.__db.teachers.find(query, collation=COLLATION):
+                key = tuple(el.get(k) for k in self.KEY_FIELDS)
+
+                if key in current:
+                    stale.append(el["_id"])
+                    add_summary(deltas, el, -1)
+                else:
+                    current[key] = el
+
+            seen = set()
+            ops = []
+
+            for el in data:
+                key = tuple(el.get(k) for k in self.KEY_FIELDS)
+
+                if key in seen:
+                    logging.warning(f"Duplicate record skipped: {key}")
+                    continue
+
+                seen.add(key)
+                old = current.get(key)
+
+                if old is None:
+                    ops.append(pymongo.InsertOne(dict(el)))
+                    names.append(el["teacher"])
+                    affected.add((el["fac"], el["teacher"]))
+                    add_summary(deltas, el)
+                    counts["inserted"] += 1
+                else:
+                    diff = {
+                        k: v for k, v in el.items() 
+                        if k != "prog" and old.get(k) != v
+                    }
+
+                    if diff:
+                        ops.append(pymongo.UpdateOne(
+                            {"_id": old["_id"]}, 
+                            {"$set": diff}
+                        ))
+                        affected.add((el["fac"], el["teacher"]))
+                        add_summary(deltas, old, -1)
+                        add_summary(deltas, dict(old, **diff))
+                        counts["updated"] += 1
+                    else:
+                        counts["unchanged"] += 1
+
+            for key, el in current.items():
+                if key not in seen:
+                    stale.append(el["_id"])
+                    affected.add((el.get("fac"), el.get("teacher")))
+                    add_summary(deltas, el, -1)
+
+            for i in range(0, len(stale), self.BATCH_SIZE):
+                ops.append(pymongo.DeleteMany(
+                    {"_id": {"$in": stale[i:i + self.BATCH_SIZE]}}
+                ))
+
+            counts["deleted"] = len(stale)
+
+            if ops:
+                self.__drop_backup()
+
+            for i in range(0, len(ops), self.BATCH_SIZE):
+                self.__db.teachers.bulk_write(
+                    ops[i:i + self.BATCH_SIZE], 
+                    ordered=False
+                )
+
+            self.__apply_summary(deltas)
+            self.recompute_forecasts(affected)
+            self.ensure_indexes()
+        except Exception as ex_:
+            logging.error(ex_)
+            self.__set_names(None)
+            self.__repair_summary()
+            raise
+        finally:
+            self.__touch()
+
+        if counts["deleted"] > 0:
+            self.__set_names(None)
+        else:
+            self.__add_names(names)
+
+        return counts
+
+    def __forecast_engine(self) -> ForecastEngine:
+        refs = self.get_refs()
+
+        return ForecastEngine(
+            refs["kpi_awards_succ"], 
+            refs["state_awards_succ"]
+        )
+
+    def __forecast_rows(self, match: dict) -> typing.Iterator[dict]:
+        return self.__db.teachers.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"fac": "$fac", "teacher": "$teacher"},
+                "rows": {"$push": {
+                    "_id": "$_id",
+                    "gram": "$gram",
+                    "state_gram": "$state_gram",
+                    "year": "$year",
+                    "state_year": "$state_year",
+                    "prog": "$prog",
+                }},
+            }},
+        ], allowDiskUse=True, collation=COLLATION)
+
+    def __apply_forecasts(self, groups, forecasts, engine) -> int:
+        ops = []
+        count = 0
+
+        for group in groups:
+            fac, teacher = group["_id"]["fac"], group["_id"]["teacher"]
+            rows = group["rows"]
+            doc = engine.forecast(fac, teacher, rows)
+
+            forecasts.append(pymongo.ReplaceOne(
+                {"fac": fac, "teacher": teacher}, 
+                doc, 
+                upsert=True
+            ))
+
+            for el in rows:
+                track = "gram" if el.get("gram") is not None else "state_gram"
+
+                if el.get("prog") != doc[track]:
+                    ops.append(pymongo.UpdateOne(
+                        {"_id": el["_id"]}, 
+                        {"$set": {"prog": doc[track]}}
+                    ))
+
+            if len(ops) >= self.BATCH_SIZE:
+                self.__flush(ops)
+
+            if len(forecasts) >= self.BATCH_SIZE:
+                self.__flush_forecasts(forecasts)
+
+            count += 1
+
+        self.__flush(ops)
+        self.__flush_forecasts(forecasts)
+
+        return count
+
+    def __stage_forecasts(self, staging, target, groups: dict) -> int:
+        engine = self.__forecast_engine()
+        forecasts = []
+        ops = []
+
+        target.create_index([("fac", 1), ("teacher", 1)], unique=True)
+
+        for fac, teacher, rows in groups.values():
+            doc = engine.forecast(fac, teacher, rows)
+            forecasts.append(pymongo.InsertOne(doc))
+
+            for track, gram in (("gram", {"$ne": None}), ("state_gram", None)):
+                progs = {
+                    el["prog"] for el in rows 
+                    if (el["gram"] is not None) == (track == "gram")
+                }
+
+                if progs and progs != {doc[track]}:
+                    ops.append(pymongo.UpdateMany(
+                        {"fac": fac, "teacher": teacher, "gram": gram}, 
+                        {"$set": {"prog": doc[track]}},
+                        collation=COLLATION
+                    ))
+
+            if len(ops) >= self.BATCH_SIZE:
+                staging.bulk_write(ops, ordered=False)
+                ops.clear()
+
+            if len(forecasts) >= self.BATCH_SIZE:
+                target.bulk_write(forecasts, ordered=False)
+                forecasts.clear()
+
+        if ops:
+            staging.bulk_write(ops, ordered=False)
+
+        if forecasts:
+            target.bulk_write(forecasts, ordered=False)
+
+        return len(groups)
+
+    def __flush_forecasts(self, ops: list):
+        if ops:
+            self.__db[self.FORECASTS_COLLECTION].bulk_write(ops)
+            ops.clear()
+
+    def recompute_forecasts(
+        self, 
+        keys: typing.Iterable[typing.Tuple[str, str]]
+    ) -> int:
+        keys = list(set(keys))
+        engine = self.__forecast_engine()
+        forecasts = []
+        count = 0
+
+        for i in range(0, len(keys), self.BATCH_SIZE):
+            batch = keys[i:i + self.BATCH_SIZE]
+
+            for fac, teacher in batch:
+                forecasts.append(pymongo.DeleteOne(
+                    {"fac": fac, "teacher": teacher}
+                ))
+
+            count += self.__apply_forecasts(
+                self.__forecast_rows({"$or": [
+                    {"fac": fac, "teacher": teacher} 
+                    for fac, teacher in batch
+                ]}),
+                forecasts,
+                engine
+            )
+
+        return count
+
+    def rebuild_forecasts(self) -> int:
+        self.__db[self.FORECASTS_COLLECTION].drop()
+        self.__db[self.FORECASTS_COLLECTION].create_index(
+            [("fac", 1), ("teacher", 1)], 
+            unique=True
+        )
+
+        return self.__apply_forecasts(
+            self.__forecast_rows({}), 
+            [], 
+            self.__forecast_engine()
+        )
+
+    def get_forecast(
+        self, 
+        fac: str, 
+        teacher: str
+    ) -> typing.Union[dict, None]:
+        doc = self.__db[self.FORECASTS_COLLECTION].find_one(
+            {"fac": fac, "teacher": teacher}, 
+            {"_id": 0}
+        )
+
+        if doc is None:
+            return None
+
+        refs = self.get_refs()
+
+        return dict(
+            doc,
+            gram=to_award_name(doc["gram"], refs["kpi_awards_by_id"]),
+            state_gram=to_award_name(
+                doc["state_gram"], 
+                refs["state_awards_by_id"]
+            )
+        )
+
+    def schema_version(self) -> int:
+        ans = self.__db.meta.find_one({"_id": "schema"}, {"version": 1})
+
+        if ans:
+            return ans["version"]
+
+        if self.__db.teachers.find_one({}, {"_id": 1}) is None:
+            return SCHEMA_VERSION
+
+        return 1
+
+    def __require_schema(self):
+        version = self.schema_version()
+
+        if version < SCHEMA_VERSION:
+            raise SchemaOutdated(
+                f"Помилка: застаріла схема даних (v{version}). "
+                "Виконайте: python migrate.py"
+            )
+
+        self.__db.meta.update_one(
+            {"_id": "schema"}, 
+            {"$setOnInsert": {"version": version}}, 
+            upsert=True
+        )
+
+    def __migrate_v2(self, dry_run: bool) -> int:
+        refs = self.get_refs()
+        errors = set()
+
+        for el in self.__db.teachers.find():
+            try:
+                encode(el, refs)
+            except ValueError as ex_:
+                errors.add(str(ex_))
+
+        if errors:
+            raise ValueError("\n".join(sorted(errors)))
+
+        if dry_run:
+            return self.__db.teachers.count_documents({})
+
+        ops = []
+        count = 0
+
+        for el in self.__db.teachers.find():
+            ops.append(pymongo.ReplaceOne(
+                {"_id": el["_id"]}, 
+                encode(el, refs)
+            ))
+            count += 1
+
+            if len(ops) >= self.BATCH_SIZE:
+                self.__flush(ops)
+
+        self.__flush(ops)
+
+        return count
+
+    def migrate(self, dry_run: bool = False) -> typing.Dict[int, int]:
+        migrations = {2: self.__migrate_v2}
+        version = self.schema_version()
+        done = {}
+
+        try:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                done[target] = migrations[target](dry_run)
+
+                if not dry_run:
+                    self.__db.meta.update_one(
+                        {"_id": "schema"}, 
+                        {"$set": {"version": target}}, 
+                        upsert=True
+                    )
+        finally:
+            if done and not dry_run:
+                self.ensure_indexes()
+                self.rebuild_summary()
+                self.rebuild_forecasts()
+                self.__set_names(None)
+                self.__touch()
+
+        return done
+
+    def get_facs(self):
+        try:
+            elmnts = self.__db.facs.find()
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            return elmnts
+
+    def get_kpi_awards(self):
+        try:
+            elmnts = self.__db.kpi_awards.find()
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            return elmnts
+
+    def get_state_awards(self):
+        try:
+            elmnts = self.__db.state_awards.find()
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            return elmnts
+
+    def get_kpi_award_next(self, data: dict):
+        try:
+            name = self.get_refs()["kpi_awards_next"].get(data["name"])
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            return name
+
+    def get_state_award_next(self, data: dict):
+        try:
+            name = self.get_refs()["state_awards_next"].get(data["name"])
+        except Exception as ex_:
+            logging.error(ex_)
+        else:
+            return name
+
+    def check_facs(self, fac: str):
+        try:
+            return fac in self.get_refs()["facs"]
+        except Exception as ex_:
+            logging.info(ex_)
+            return False
+
+    def check_kpi_awards(self, award: str):
+        try:
+            return award in self.get_refs()["kpi_awards"]
+        except:
+            return False
+
+    def check_state_awards(self, award: str):
+        try:
+            return award in self.get_refs()["state_awards"]
+        except:
+            return False
+
+class TeachersQuery:
+    def __init__(
+        self, 
+        db: DataBase, 
+        filters: dict = None,
+        page_size: int = DataBase.PAGE_SIZE,
+        snapshot: bool = True
+    ):
+        self.__db = db
+        self.__filters = dict(filters or {})
+        self.__page_size = page_size
+        self.__snapshot = snapshot
+        self.__stamp = None
+        self.__pages = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def filters(self) -> dict:
+        return dict(self.__filters)
+
+    def page(self, token: str = None) -> dict:
+        stamp = self.__db.version() if self.__snapshot else None
+
+        with self.__lock:
+            if not self.__snapshot or stamp != self.__stamp:
+                self.__pages.clear()
+                self.__stamp = stamp
+
+            page = self.__pages.get(token)
+
+        if page is None:
+            page = self.__db.get_teachers_page(
+                self.__filters, 
+                page_size=self.__page_size, 
+                token=token
+            )
+
+            with self.__lock:
+                if self.__snapshot and stamp == self.__stamp:
+                    self.__pages[token] = page
+
+        return dict(page, items=list(page["items"]))
+
+    def __iter__(self) -> typing.Iterator[dict]:
+        token = None
+
+        while True:
+            page = self.page(token)
+            yield from page["items"]
+
+            token = page["token"]
+            if token is None:
+                break
@@ -0,0 +1,70 @@
+import columnar
+import csv
+import openpyxl
+import typing
+
+HEADERS = {
+    "teacher": "Прізвище, ім'я, по-батькові співробітника",
+    "fac": "Факультет/ННІ",
+    "gram": "Нагорода (Почесне звання, відзнака та грамота)",
+    "state_gram": "Державна нагорода",
+    "num": ("№ Протоколу ВР КПІ ім. Ігоря "
+            "Сікорського про відзнічення"),
+    "year": "Рік відзначення КПІ",
+    "state_year": "Рік призначення державою",
+    "prog": "Прогнозування"
+}
+
+def iter_rows(db, filters: dict = None) -> typing.Iterator[list]:
+    num = 0
+
+    for batch in db.iter_teacher_batches(filters, HEADERS):
+        for el in batch:
+            num += 1
+            yield [num] + [el.get(k) for k in HEADERS]
+
+def write_csv(url: str, rows: typing.Iterable[list]) -> int:
+    count = 0
+
+    with open(url, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["№"] + list(HEADERS.values()))
+
+        for row in rows:
+            writer.writerow(["" if el is None else el for el in row])
+            count += 1
+
+    return count
+
+def write_xlsx(url: str, rows: typing.Iterable[list]) -> int:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["№"] + list(HEADERS.values()))
+    count = 0
+
+    for row in rows:
+        ws.append(row)
+        count += 1
+
+    wb.save(url)
+
+    return count
+
+def export_file(
+    db,
+    url: str,
+    fmt: str,
+    filters: dict = None
+) -> int:
+    if fmt == "xlsx":
+        return write_xlsx(url, iter_rows(db, filters))
+    elif fmt == "csv":
+        return write_csv(url, iter_rows(db, filters))
+    elif fmt in columnar.FORMATS:
+        return columnar.write(
+            url, 
+            fmt, 
+            db.iter_teacher_batches(filters, HEADERS)
+        )
+    else:
+        raise ValueError("Can't parse file (no such format)")
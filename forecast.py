@@ -0,0 +1,65 @@
+import typing
+
+TRACKS = (("gram", "year"), ("state_gram", "state_year"))
+
+def successors(catalog: typing.Iterable[dict]) -> typing.Dict[int, int]:
+    catalog = list(catalog)
+    ids = {int(el["id"]) for el in catalog}
+    table = {}
+
+    for el in catalog:
+        award = int(el["id"])
+
+        if "next" in el:
+            if el["next"] is not None:
+                table[award] = int(el["next"])
+        elif award + 1 in ids:
+            table[award] = award + 1
+
+    return table
+
+class ForecastEngine:
+    def __init__(
+        self,
+        kpi_next: typing.Dict[int, int],
+        state_next: typing.Dict[int, int]
+    ):
+        self.__next = {"gram": dict(kpi_next), "state_gram": dict(state_next)}
+
+    def next_award(
+        self,
+        track: str,
+        awards: typing.Iterable[typing.Tuple[int, typing.Union[int, None]]]
+    ) -> typing.Tuple[typing.Union[int, None], typing.Union[int, None]]:
+        table = self.__next[track]
+        awards = [el for el in awards if isinstance(el[0], int)]
+
+        if not awards:
+            return None, None
+
+        held = {award for award, _ in awards}
+        last, year = max(awards, key=lambda el: (el[1] or 0, el[0]))
+        award = table.get(last)
+        seen = set()
+
+        while award in held and award not in seen:
+            seen.add(award)
+            award = table.get(award)
+
+        return (None if award in held else award), year
+
+    def forecast(
+        self,
+        fac: str,
+        teacher: str,
+        rows: typing.List[dict]
+    ) -> dict:
+        doc = {"fac": fac, "teacher": teacher}
+
+        for track, year in TRACKS:
+            doc[track], doc[year] = self.next_award(
+                track,
+                [(el.get(track), el.get(year)) for el in rows]
+            )
+
+        return doc
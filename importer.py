@@ -0,0 +1,324 @@
+import columnar
+import concurrent.futures
+import itertools
+import logging
+import multiprocessing
+import openpyxl
+import os
+import pandas as pd
+import time
+import typing
+
+COLUMNS = [
+    "teacher", "fac", "gram", "state_gram",
+    "num", "year", "state_year", "prog",
+]
+
+EMPTY = ("", "nan")
+
+CHUNK_SIZE = 5000
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+FORMATS = ("xlsx", "csv") + columnar.FORMATS
+
+XLSX_ENGINES = ["calamine", "openpyxl"]
+STREAM_ENGINES = ["openpyxl"]
+
+def open_calamine(url: str, ncols: int) -> tuple:
+    from python_calamine import CalamineWorkbook
+
+    wb = CalamineWorkbook.from_path(url)
+    sheet = wb.get_sheet_by_index(0)
+    rows = (row[:ncols] for row in sheet.iter_rows())
+
+    return rows, sheet.height, wb.close
+
+def open_openpyxl(url: str, ncols: int) -> tuple:
+    wb = openpyxl.load_workbook(url, read_only=True, data_only=True)
+    ws = wb.worksheets[0]
+    rows = ws.iter_rows(max_col=ncols, values_only=True)
+
+    return rows, ws.max_row or 0, wb.close
+
+XLSX_READERS = {"calamine": open_calamine, "openpyxl": open_openpyxl}
+
+def open_xlsx(url: str, engines: typing.List[str] = None) -> tuple:
+    errors = []
+
+    for name in engines or XLSX_ENGINES:
+        try:
+            rows, total, close = XLSX_READERS[name](url, len(COLUMNS) + 1)
+        except Exception as ex_:
+            logging.info(f"{name}: {ex_}")
+            errors.append(f"{name}: {ex_}")
+        else:
+            return rows, total, close, name
+
+    raise ValueError(f"Can't parse file ({'; '.join(errors)})")
+
+def clean_cell(value):
+    if value == "":
+        return None
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return value
+
+def iter_xlsx(
+    url: str, 
+    chunksize: int = CHUNK_SIZE, 
+    engines: typing.List[str] = None
+) -> typing.Iterator[typing.Tuple[pd.DataFrame, int, int]]:
+    rows, total, close, _ = open_xlsx(url, engines)
+
+    try:
+        total = max(total - 1, 0)
+        next(rows, None)
+        done = 0
+
+        while True:
+            batch = list(itertools.islice(rows, chunksize))
+            if not batch:
+                break
+
+            done += len(batch)
+            batch = [[clean_cell(el) for el in row] for row in batch]
+            df = pd.DataFrame(batch).dropna(how="all")
+
+            if len(df) > 0:
+                yield df, done, max(total, done)
+    finally:
+        close()
+
+def concat_chunks(chunks: typing.Iterable[tuple]) -> pd.DataFrame:
+    frames = [df for df, _, _ in chunks]
+
+    if not frames:
+        return pd.DataFrame(columns=range(len(COLUMNS) + 1))
+
+    return pd.concat(frames, ignore_index=True)
+
+def read_table(url: str, fmt: str) -> pd.DataFrame:
+    if fmt == "xlsx":
+        return concat_chunks(iter_xlsx(url, CHUNK_SIZE))
+    elif fmt == "csv":
+        return pd.read_csv(url)
+    elif fmt in columnar.FORMATS:
+        return concat_chunks(columnar.iter_batches(url, fmt, CHUNK_SIZE))
+    else:
+        raise ValueError("Can't parse file (no such format)")
+
+def iter_chunks(
+    url: str, 
+    fmt: str, 
+    chunksize: int = CHUNK_SIZE
+) -> typing.Iterator[typing.Tuple[pd.DataFrame, int, int]]:
+    if fmt == "xlsx":
+        yield from iter_xlsx(url, chunksize, STREAM_ENGINES)
+    elif fmt == "csv":
+        total = os.path.getsize(url)
+
+        with open(url, "rb") as file:
+            for df in pd.read_csv(file, chunksize=chunksize):
+                yield df, min(file.tell(), total), total
+    elif fmt in columnar.FORMATS:
+        yield from columnar.iter_batches(url, fmt, chunksize)
+    else:
+        raise ValueError("Can't parse file (no such format)")
+
+def to_integral(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return value
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    if set(COLUMNS) <= set(df.columns):
+        data = df[COLUMNS].astype(object)
+    elif df.shape[1] < len(COLUMNS) + 1:
+        raise ValueError(
+            f"Expected {len(COLUMNS) + 1} columns, got {df.shape[1]}"
+        )
+    else:
+        data = df.iloc[:, 1:len(COLUMNS) + 1].astype(object)
+
+    data.columns = COLUMNS
+
+    for name in ("num", "year", "state_year"):
+        data[name] = data[name].map(to_integral)
+
+    data = data.where(data.notna(), "nan").astype(str)
+
+    for name in COLUMNS:
+        data[name] = data[name].str.strip()
+
+    for name in ("gram", "state_gram"):
+        data[name] = data[name].str.replace("(`|'|\")", "'", regex=True)
+
+    return data
+
+def validate(data: pd.DataFrame, refs: dict):
+    has_gram = ~data["gram"].isin(EMPTY)
+    has_state_gram = ~data["state_gram"].isin(EMPTY)
+
+    bad = ~data["fac"].isin(refs["facs"])
+    if bad.any():
+        raise KeyError(
+            "У КПІ не існує такого факультету/ННІ: "
+            f"{data['fac'][bad].iloc[0]}"
+        )
+
+    bad = has_gram & ~data["gram"].isin(refs["kpi_awards"])
+    if bad.any():
+        raise KeyError(
+            f"У КПІ не існує такої нагороди: {data['gram'][bad].iloc[0]}"
+        )
+
+    bad = has_state_gram & ~data["state_gram"].isin(refs["state_awards"])
+    if bad.any():
+        raise KeyError(
+            "Не існує такої державної нагороди: "
+            f"{data['state_gram'][bad].iloc[0]}"
+        )
+
+    for name in ("year", "state_year"):
+        bad = ~data[name].isin(EMPTY) & ~data[name].str.fullmatch(r"\d{4}")
+        if bad.any():
+            raise KeyError(f"Некоректний рік: {data[name][bad].iloc[0]}")
+
+    bad = ~has_gram & ~has_state_gram
+    if bad.any():
+        raise KeyError(
+            "Не вказано нагороду для викладача: "
+            f"{data['teacher'][bad].iloc[0]}"
+        )
+
+def prepare(df: pd.DataFrame, refs: dict) -> typing.List[dict]:
+    data = normalize(df)
+    validate(data, refs)
+
+    return data.to_dict("records")
+
+def iter_prepared(
+    url: str, 
+    fmt: str, 
+    refs: dict,
+    chunksize: int = None,
+    progress: typing.Callable[[int, int], None] = None
+) -> typing.Iterator[typing.List[dict]]:
+    if not chunksize:
+        yield prepare(read_table(url, fmt), refs)
+
+        if progress:
+            progress(1, 1)
+
+        return
+
+    for df, done, total in iter_chunks(url, fmt, chunksize):
+        yield prepare(df, refs)
+
+        if progress:
+            progress(done, total)
+
+def get_chunksize(url: str, chunksize: int = None) -> int:
+    if chunksize is None and os.path.getsize(url) > STREAM_THRESHOLD:
+        return CHUNK_SIZE
+
+    return chunksize
+
+def get_format(url: str) -> str:
+    return os.path.splitext(url)[1].lstrip(".").lower()
+
+def list_files(paths: typing.Iterable[str]) -> typing.List[str]:
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if get_format(name) in FORMATS and not name.startswith("~$")
+            )
+        else:
+            files.append(path)
+
+    return files
+
+def parse_file(url: str, refs: dict) -> dict:
+    start = time.perf_counter()
+    report = {"file": url, "rows": 0, "error": None}
+
+    try:
+        chunks = iter_prepared(url, get_format(url), refs, get_chunksize(url))
+        report["data"] = list(itertools.chain.from_iterable(chunks))
+        report["rows"] = len(report["data"])
+    except Exception as ex_:
+        report["error"] = str(ex_)
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+
+    return report
+
+def import_files(
+    db, 
+    paths: typing.Iterable[str], 
+    workers: int = None,
+    progress: typing.Callable[[int, int], None] = None
+) -> dict:
+    start = time.perf_counter()
+    files = list_files(paths)
+    refs = db.get_refs()
+    reports = []
+
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, 
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+    try:
+        futures = [pool.submit(parse_file, url, refs) for url in files]
+
+        for future in concurrent.futures.as_completed(futures):
+            reports.append(future.result())
+
+            if progress:
+                progress(len(reports), len(files))
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    else:
+        pool.shutdown()
+
+    reports.sort(key=lambda el: files.index(el["file"]))
+    rows = [el.pop("data") for el in reports if el["error"] is None]
+    data = list(itertools.chain.from_iterable(rows))
+    counts = {}
+
+    if data:
+        counts = db.sync_teachers(data, scope={el["fac"] for el in data})
+
+    return {
+        "files": reports,
+        "counts": counts,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def import_file(
+    db, 
+    url: str, 
+    fmt: str, 
+    mode: str = "replace",
+    chunksize: int = None,
+    progress: typing.Callable[[int, int], None] = None
+) -> dict:
+    chunksize = get_chunksize(url, chunksize)
+    chunks = iter_prepared(url, fmt, db.get_refs(), chunksize, progress)
+
+    if mode == "sync":
+        return db.sync_teachers(itertools.chain.from_iterable(chunks))
+    elif mode != "replace":
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    count = db.set_and_rm_teachers(itertools.chain.from_iterable(chunks))
+
+    return {"inserted": count}
@@ -1,159 +1,298 @@
+import time
+
+STARTED = time.perf_counter()
+
 import datetime
 import logging
-import pandas as pd
-import pymongo
+import os
 import sys
 import functools
+import threading
 import typing
 import re
 
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QObject, QRunnable, QThreadPool, \
+    pyqtSignal, pyqtSlot, QAbstractTableModel, QModelIndex, QStringListModel, \
+    QTimer
+from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, \
     QWidget, QListWidget, QListWidgetItem, QVBoxLayout, QLineEdit, QLabel, \
-    QHBoxLayout, QAction, QFileDialog, QComboBox, QMessageBox
+    QHBoxLayout, QAction, QFileDialog, QComboBox, QMessageBox, \
+    QProgressBar, QTableView, QHeaderView, QCompleter, QTabWidget, \
+    QTableWidget, QTableWidgetItem
 
-class DataBase:
-    def __init__(
-        self, 
-        host: str, 
-        port: int, 
-        dbname: str, 
-        user: str = None,
-        password: str = None
-    ):
-        url = "mongodb://"
-        
-        if user and password:
-            url += f"{user}:{password}@"
-        
-        url += f"{host}:{port}/{dbname}"
-        self.__client = pymongo.MongoClient(url)
-        self.__db = self.__client[dbname]
-
-    def get_teachers(self, filters: dict = None):
-        try:
-            if filters:
-                elmnts = self.__db.teachers.find(filters)
-            else:
-                elmnts = self.__db.teachers.find()
-        except:
-            elmnts = None
-
-        return elmnts
-
-    def set_teacher(self, data: dict) -> typing.Union[str, None]:
-        ans = self.__db.teachers.find_one({
-            "fac": data["fac"],
-            "teacher": data["teacher"],
-            "$or": [
-                {"year": data["year"]},
-                {"year": data["state_year"]},
-                {"state_year": data["state_year"]},
-                {"state_year": data["year"]},
-            ]
-        })
+import columnar
+from database import DataBase, ImportLocked, SchemaOutdated, \
+    TeachersQuery, SCHEMA_VERSION, compile_filters, is_refinement, \
+    match_filters
 
-        if ans:
-            raise Exception(
-                "Помилка: викладач вже отримав нагороду у вказаному році"
-            )
+def import_file(*args, **kwargs) -> dict:
+    import importer
 
-        try:
-            self.__db.teachers.insert_one(data)
-        except Exception as ex_:
-            logging.error(ex_)
+    return importer.import_file(*args, **kwargs)
 
-    def set_and_rm_teachers(self, data: typing.List[dict]):
-        try:
-            self.__db.teachers.drop()
-            self.__db.teachers.insert_many(data)
-        except Exception as ex_:
-            logging.error(ex_)
+def import_files(*args, **kwargs) -> dict:
+    import importer
 
-    def get_facs(self):
-        try:
-            elmnts = self.__db.facs.find()
-        except Exception as ex_:
-            logging.error(ex_)
-        else:
-            return elmnts
+    return importer.import_files(*args, **kwargs)
 
-    def get_kpi_awards(self):
-        try:
-            elmnts = self.__db.kpi_awards.find()
-        except Exception as ex_:
-            logging.error(ex_)
-        else:
-            return elmnts
+def export_file(*args, **kwargs) -> int:
+    import exporter
 
-    def get_state_awards(self):
-        try:
-            elmnts = self.__db.state_awards.find()
-        except Exception as ex_:
-            logging.error(ex_)
-        else:
-            return elmnts
+    return exporter.export_file(*args, **kwargs)
 
-    def get_kpi_award_next(self, data: dict):
-        try:
-            elmnt = self.__db.kpi_awards.find_one(data)["id"]
-            name = self.__db.kpi_awards.find_one(
-                {"id": int(elmnt) + 1}
-            )["name"]
-        except Exception as ex_:
-            logging.error(ex_)
-        else:
-            return name
+class TaskCancelled(Exception):
+    pass
+
+class TaskSignals(QObject):
+    done = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    progress = pyqtSignal(object, int, int)
+
+class Task(QRunnable):
+    def __init__(self, fn: typing.Callable, *args, **kwargs):
+        super().__init__()
+
+        self.signals = TaskSignals()
+        self.__fn = fn
+        self.__args = args
+        self.__kwargs = kwargs
+        self.__cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def cancel(self):
+        self.__cancelled.set()
+
+    def pass_progress(self):
+        self.__kwargs["progress"] = self.report
 
-    def get_state_award_next(self, data: dict):
+    def report(self, done: int, total: int):
+        if self.cancelled:
+            raise TaskCancelled()
+
+        self.signals.progress.emit(self, done, total)
+
+    def run(self):
         try:
-            elmnt = self.__db.state_awards.find_one(data)["id"]
-            name = self.__db.kpi_awards.find_one(
-                {"id": int(elmnt) + 1}
-            )["name"]
+            result = self.__fn(*self.__args, **self.__kwargs)
         except Exception as ex_:
-            logging.error(ex_)
+            self.signals.failed.emit(self, ex_)
         else:
-            return name
+            self.signals.done.emit(self, result)
 
-    def check_facs(self, fac: str):
-        try:
-            self.__db.facs.find_one({"name": fac})
-        except Exception as ex_:
-            logging.info(ex_)
-            return False
-        
-        return True
+class TaskRunner(QObject):
+    busy = pyqtSignal(bool)
+    progress = pyqtSignal(int, int)
 
-    def check_kpi_awards(self, award: str):
-        try:
-            self.__db.kpi_awards.find_one({"name": award})
-        except:
-            return False
-        
-        return True
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.__pool = QThreadPool(self)
+        self.__tasks = {}
+        self.__keys = {}
+
+    def start(
+        self, 
+        fn: typing.Callable, 
+        *args, 
+        on_done: typing.Callable = None,
+        on_failed: typing.Callable = None,
+        on_progress: bool = False,
+        key: str = None,
+        **kwargs
+    ) -> Task:
+        if key:
+            self.cancel(key)
+
+        task = Task(fn, *args, **kwargs)
+
+        if on_progress:
+            task.pass_progress()
+
+        task.setAutoDelete(False)
+        task.signals.done.connect(self.__on_done)
+        task.signals.failed.connect(self.__on_failed)
+        task.signals.progress.connect(self.__on_progress)
+
+        self.__tasks[task] = (on_done, on_failed, key)
+        if key:
+            self.__keys[key] = task
+
+        self.busy.emit(True)
+        self.__pool.start(task)
+
+        return task
+
+    def cancel(self, key: str = None, keep: typing.Iterable[str] = ()):
+        if key is None:
+            for task, (_, _, name) in self.__tasks.items():
+                if name not in keep:
+                    task.cancel()
+        elif key in self.__keys:
+            self.__keys.pop(key).cancel()
+
+    def __finish(self, task: Task) -> tuple:
+        on_done, on_failed, key = self.__tasks.pop(task)
+
+        if key and self.__keys.get(key) is task:
+            self.__keys.pop(key)
+
+        if not self.__tasks:
+            self.busy.emit(False)
+
+        return on_done, on_failed
+
+    @pyqtSlot(object, object)
+    def __on_done(self, task: Task, result):
+        on_done, _ = self.__finish(task)
+
+        if on_done and not task.cancelled:
+            on_done(result)
+
+    @pyqtSlot(object, object)
+    def __on_failed(self, task: Task, ex_: Exception):
+        _, on_failed = self.__finish(task)
+
+        if isinstance(ex_, TaskCancelled) or task.cancelled:
+            return
+
+        logging.error(ex_)
+
+        if on_failed:
+            on_failed(ex_)
+
+    @pyqtSlot(object, int, int)
+    def __on_progress(self, task: Task, done: int, total: int):
+        if not task.cancelled:
+            self.progress.emit(done, total)
 
-    def check_state_awards(self, award: str):
-        try:
-            self.__db.state_awards.find_one({"name": award})
-        except:
-            return False
-        
-        return True
-        
 class InformationFromDB(QListWidgetItem):
     def __init__(self, data: str):
         super().__init__()
 
         self.setText(data)
 
-class Table(QListWidget):
-    def __init__(self, parent):
+class TeachersModel(QAbstractTableModel):
+    FETCH_SIZE = 200
+
+    def __init__(
+        self, 
+        parent, 
+        page: dict, 
+        fetch: typing.Callable[[str], dict] = None,
+        tasks: TaskRunner = None
+    ):
         super().__init__(parent)
-        self.__temp_data = []
+
+        self.__rows = list(page["items"])
+        self.__token = page["token"]
+        self.__total = page.get("total")
+        self.__fetch = fetch
+        self.__tasks = tasks
+        self.__loading = False
+        self.__closed = False
+        self.__texts = {}
+        self.__now = datetime.datetime.now()
+
+    @property
+    def total(self):
+        return self.__total
+
+    def close(self):
+        self.__closed = True
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.__rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else 1
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        row = index.row()
+
+        if row not in self.__texts:
+            self.__texts[row] = self.format(self.__rows[row])
+
+        return self.__texts[row]
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return (not parent.isValid() and 
+                self.__fetch is not None and 
+                self.__token is not None and 
+                not self.__loading)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        self.__loading = True
+        self.__tasks.start(
+            self.__fetch,
+            self.__token,
+            on_done=self.__append,
+            on_failed=self.__fetch_failed
+        )
+
+    def __append(self, page: dict):
+        if self.__closed:
+            return
+
+        self.__loading = False
+        self.__token = page["token"]
+        items = page["items"]
+
+        if items:
+            first = len(self.__rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(items) - 1)
+            self.__rows += items
+            self.endInsertRows()
+
+    def __fetch_failed(self, ex_: Exception):
+        self.__loading = False
+
+    def format(self, el: dict) -> str:
+        gram, kpi = ((el["gram"], True) if el["gram"] 
+                     else (el["state_gram"], False))
+        year = el["year"] if kpi else el["state_year"]
+
+        if year is None:
+            return f"{el['teacher']} отримав нагороду {gram}"
+
+        prog = el["prog"]
+        year_d = year
+
+        if year_d >= self.__now.year - 1 and prog:
+            prog_m = f", за прогнозом є можливість отримати {prog} у {year_d}"
+        else:
+            prog_m = ""
+
+        return (
+            f"{el['teacher']} отримав  у {year} році нагороду "
+            f"{gram}{prog_m}"
+        )
+
+class Table(QTableView):
+    def __init__(self, parent, tasks: TaskRunner):
+        super().__init__(parent)
+        self.__filters = None
+        self.__tasks = tasks
+
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setSelectionBehavior(QTableView.SelectRows)
 
         self.setStyleSheet(
-            "QListWidget {"
+            "QTableView {"
                 "background-color: whitesmoke;"
                 "border: 1px solid black;"
                 "max-width: 2000px;"
@@ -161,7 +300,7 @@ class Table(QListWidget):
                 "max-height: 900px;"
                 "margin: 5px;"
             "}"
-            "QListWidget::item {"
+            "QTableView::item {"
                 "background-color: #82ccdd;"
                 "border: 1px solid grey;"
                 "border-radius: 2px;"
@@ -170,39 +309,75 @@ class Table(QListWidget):
         )
 
     @property
-    def temp_data(self):
-        return self.__temp_data.copy()
-
-    def show_data(self, data):
-        self.clear()
-        self.__temp_data.clear()
-
-        now = datetime.datetime.now()
-
-        for el in data:
-            self.__temp_data.append(el)
-
-            gram, kpi = ((el["gram"], True )if len(el["gram"]) > 0 
-                         and el["gram"] != "nan"
-                         else (el["state_gram"], False))
-            year = el["year"] if kpi else el["state_year"]
-            year = int(year)
-            prog = el["prog"]
-            year_d = year
-
-            if (year_d >= now.year - 1 and 
-                prog and len(prog) > 0 and 
-                prog != "nan"):
-                prog_m = f", за прогнозом є можливість отримати {prog} у {year_d}"
-            else:
-                prog_m = ""
+    def filters(self):
+        return dict(self.__filters) if self.__filters else None
 
-            self.addItem(
-                f"{el['teacher']} отримав  у {year} році нагороду "
-                f"{gram}{prog_m}"
-            )
+    def show_data(self, page: dict, query: TeachersQuery = None):
+        self.__filters = query.filters if query else None
+
+        model = TeachersModel(
+            self, 
+            page, 
+            query.page if query else None, 
+            self.__tasks
+        )
+        old = self.model()
+
+        self.setModel(model)
+        if old is not None:
+            old.close()
+            old.deleteLater()
+
+class Statistics(QTabWidget):
+    KINDS = {"kpi": "КПІ", "state": "Державна"}
+
+    def __init__(self, parent, stats: dict):
+        super().__init__(parent)
+
+        self.__add_tab(
+            "Факультети",
+            ["Факультет/ННІ", "Кількість"],
+            [(el["fac"], el["count"]) for el in stats["by_fac"]]
+        )
+        self.__add_tab(
+            "Роки",
+            ["Рік", "Кількість"],
+            [
+                (el["year"] if el["year"] is not None else "—", el["count"])
+                for el in stats["by_year"]
+            ]
+        )
+        self.__add_tab(
+            "Нагороди",
+            ["Нагорода", "Тип", "Кількість"],
+            [
+                (el["award"], self.KINDS[el["kind"]], el["count"])
+                for el in stats["by_award"]
+            ]
+        )
+
+    def __add_tab(self, title: str, headers: list, rows: list):
+        table = QTableWidget(len(rows), len(headers), self)
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().hide()
+        table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeToContents
+        )
+        table.horizontalHeader().setStretchLastSection(True)
+
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                table.setItem(i, j, QTableWidgetItem(str(value)))
+
+        self.addTab(table, title)
 
 class Filters(QWidget):
+    LIVE_DELAY_MS = 300
+
+    teacher_edited = pyqtSignal(str)
+    changed = pyqtSignal()
+
     def __init__(self, parent):
         super().__init__(parent)
 
@@ -221,6 +396,12 @@ class Filters(QWidget):
 
         self.__input_teacher = QLineEdit(self)
         self.__input_teacher.setObjectName("teacher")
+        self.__input_teacher.textEdited.connect(self.teacher_edited)
+
+        self.__suggestions = QStringListModel(self)
+        completer = QCompleter(self.__suggestions, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.__input_teacher.setCompleter(completer)
 
         layout_teacher = QHBoxLayout()
         layout_teacher.addWidget(lable_teacher)
@@ -296,6 +477,14 @@ class Filters(QWidget):
         layout_filters.addLayout(layout_state_year)
         layout_filters.addLayout(layout_prog)
 
+        self.__timer = QTimer(self)
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(self.LIVE_DELAY_MS)
+        self.__timer.timeout.connect(self.changed)
+
+        for item in self.findChildren(QLineEdit):
+            item.textChanged.connect(lambda _: self.__timer.start())
+
         self.setStyleSheet(
             "QWidget {"
                 "max-width: 450px;"
@@ -342,6 +531,9 @@ class Filters(QWidget):
 
         return filters
 
+    def set_suggestions(self, names: typing.List[typing.Tuple[str, float]]):
+        self.__suggestions.setStringList([name for name, _ in names])
+
     def clear_filters(self):
         self.__input_fac.clear()
         self.__input_teacher.clear()
@@ -357,6 +549,7 @@ class WindowToInsertData(QWidget):
         super().__init__(parent)
 
         self.__data = self.__set_data()
+        self.__pending = []
         self.__facs = facs
         self.__grams = grams
         self.__state_grams = state_grams
@@ -518,6 +711,22 @@ class WindowToInsertData(QWidget):
             "}"
         )
 
+        self.__pendingviewer = QListWidget(self)
+        self.__pendingviewer.setStyleSheet(
+            "QListWidget {"
+                "background-color: whitesmoke;"
+                "border: 1px solid black;"
+                "max-width: 600px;"
+                "min-width: 300px;"
+                "max-height: 200px;"
+                "margin: 5px 5px 5px 50px;"
+            "}"
+        )
+        self.__pendingviewer.itemDoubleClicked.connect(self.remove_pending)
+
+        pendinglabel = QLabel(self)
+        pendinglabel.setText("Черга на внесення (подвійний клік — вилучити)")
+
         statuslabel = QLabel(self)
         statuslabel.setText("Статус внесення в БД")
 
@@ -529,6 +738,13 @@ class WindowToInsertData(QWidget):
             )
         )
         layout_viewer.addWidget(self.__dataviewer)
+        layout_viewer.addWidget(
+            pendinglabel, 
+            alignment=(
+                Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignCenter
+            )
+        )
+        layout_viewer.addWidget(self.__pendingviewer)
         layout_viewer.addWidget(
             statuslabel, 
             alignment=(
@@ -603,10 +819,90 @@ class WindowToInsertData(QWidget):
         self.__dataviewer.clear()
         self.__dataviewer.addItem(output)
 
+    def check_data(self, data: dict) -> typing.Union[str, None]:
+        if len(data["teacher"]) == 0:
+            return "Помилка: потрібно внести ПІБ викладача"
+
+        if len(data["fac"]) == 0:
+            return "Помилка: потрібно обрати факультет/ННІ"
+
+        l_gram = len(data["gram"])
+        l_sgram = len(data["state_gram"])
+
+        if l_gram > 0 and l_sgram > 0:
+            return "Помилка: можна вносити лише одну нагороду"
+        elif l_gram <= 0 and l_sgram <= 0:
+            return "Помилка: потрібно внести нагороду"
+
+        l_year = len(data["year"])
+        l_syear = len(data["state_year"])
+
+        if l_year > 0 and l_syear > 0:
+            return "Помилка: можна вносити лише один рік"
+        elif l_year <= 0 and l_syear <= 0:
+            return "Помилка: потрібно внести рік"
+
+        if ((l_gram > 0 and l_syear > 0) or
+            (l_sgram > 0 and l_year > 0)):
+            return (
+                "Помилка: потрібно внести нагороду й рік її отримання "
+                "або від КПІ, або від держави"
+            )
+
+        if not re.fullmatch(r"\d{4}", data["year"] or data["state_year"]):
+            return "Помилка: рік має складатися з чотирьох цифр"
+
+        key = self.__key(data)
+
+        if any(self.__key(el) == key for el in self.__pending):
+            return "Помилка: такий запис вже є у черзі"
+
+        return None
+
+    def __key(self, data: dict) -> tuple:
+        return (
+            data["fac"].casefold(),
+            data["teacher"].casefold(),
+            data["year"] or data["state_year"],
+        )
+
+    def add_pending(self) -> typing.Union[str, None]:
+        error = self.check_data(self.__data)
+
+        if error is None:
+            self.__pending.append(dict(self.__data))
+            self.__show_pending()
+
+        return error
+
+    def get_pending(self) -> typing.List[dict]:
+        return list(self.__pending)
+
+    def set_pending(self, rows: typing.List[dict]):
+        self.__pending = list(rows)
+        self.__show_pending()
+
+    def remove_pending(self, item: QListWidgetItem):
+        del self.__pending[self.__pendingviewer.row(item)]
+        self.__show_pending()
+
+    def __show_pending(self):
+        self.__pendingviewer.clear()
+
+        for i, el in enumerate(self.__pending, 1):
+            self.__pendingviewer.addItem(
+                f"{i}. {el['teacher']} ({el['fac']}) — "
+                f"{el['gram'] or el['state_gram']}, "
+                f"{el['year'] or el['state_year']}"
+            )
+
     def clear_data(self, all):
         if all:
             self.__dataviewer.clear()
             self.__statusviewer.clear()
+            self.set_pending([])
+
+        self.__data = self.__set_data()
 
         self.__input_fac.setCurrentText("")
         self.__input_teacher.clear()
@@ -623,21 +919,125 @@ class WindowToInsertData(QWidget):
                 f"background-color: {color};"
             "}")
         self.__statusviewer.addItem(msg)
-        
+
+    def show_statuses(
+        self, 
+        rows: typing.List[dict], 
+        statuses: typing.List[dict]
+    ):
+        self.__statusviewer.clear()
+        self.__statusviewer.setStyleSheet("")
+
+        for row, status in zip(rows, statuses):
+            item = QListWidgetItem(
+                f"{status['row'] + 1}. {row['teacher']}: {status['message']}"
+            )
+            item.setForeground(
+                QColor("green" if status["status"] == "inserted" else "red")
+            )
+            self.__statusviewer.addItem(item)
+
 class MainWindow(QMainWindow):
+    RECONNECT_MS = 5000
+
     def __init__(self):
         super().__init__()
 
+        self.__shown = False
+        self.__main_view = False
+
         self.__db = DataBase("localhost", 27017, "teacher_awards")
 
         self.setWindowTitle("База даних нагород та подяк")
         self.setMinimumSize(QSize(1000, 500))
 
+        self.__tasks = TaskRunner(self)
+        self.__tasks.busy.connect(self.set_busy)
+        self.__tasks.progress.connect(self.set_progress)
+
+        self.set_statusbar()
         self.set_menubar()
         self.set_mainmenu()
 
+        self.connect_db()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+
+        if not self.__shown:
+            self.__shown = True
+            logging.info(
+                "Time to first window: "
+                f"{(time.perf_counter() - STARTED) * 1000:.0f} ms"
+            )
+
+    def connect_db(self):
+        self.set_connection("Підключення...", "gray")
+        self.__tasks.start(
+            self.__db.warm_up,
+            on_done=self.connected,
+            on_failed=self.connection_failed,
+            key="connect"
+        )
+
+    def set_connection(self, text: str, color: str):
+        self.__connection.setText(text)
+        self.__connection.setStyleSheet(f"color: {color}")
+
+    def connected(self, info: dict):
+        self.set_connection("Підключено", "green")
+        self.check_schema(info["schema"])
+
+    def connection_failed(self, ex_: Exception):
+        logging.error(ex_)
+        self.set_connection("Немає з'єднання з базою даних", "red")
+        QTimer.singleShot(self.RECONNECT_MS, self.connect_db)
+
+    def check_schema(self, version: int):
+        if version < SCHEMA_VERSION:
+            logging.warning(f"Database schema v{version} is outdated")
+            self.statusBar().showMessage(
+                "Застаріла схема даних, зміни заблоковано. "
+                "Виконайте: python migrate.py"
+            )
+
+    def set_statusbar(self):
+        self.__busy = QProgressBar(self)
+        self.__busy.setMaximumWidth(200)
+        self.__busy.hide()
+
+        self.__cancel = QPushButton("Скасувати", self)
+        self.__cancel.clicked.connect(self.cancel_tasks)
+        self.__cancel.hide()
+
+        self.__connection = QLabel(self)
+
+        status = self.statusBar()
+        status.addPermanentWidget(self.__connection)
+        status.addPermanentWidget(self.__busy)
+        status.addPermanentWidget(self.__cancel)
+
+    def set_busy(self, busy: bool):
+        self.__busy.setRange(0, 0)
+        self.__busy.setVisible(busy)
+        self.__cancel.setVisible(busy)
+
+    def set_progress(self, done: int, total: int):
+        self.__busy.setRange(0, 100)
+        self.__busy.setValue(int(100 * done / total) if total else 100)
+
+    def cancel_tasks(self):
+        self.__tasks.cancel(keep=("connect",))
+
+    def show_message(self, title: str, text: str):
+        msg = QMessageBox(self)
+        msg.setBaseSize(700, 500)
+        msg.setWindowTitle(title)
+        msg.setText(text)
+        msg.show()
+
     def set_mainmenu(self):
-        self.__table = Table(self)
+        self.__table = Table(self, self.__tasks)
         self.__filters = Filters(self)
         maindata = QWidget(self)
 
@@ -649,13 +1049,17 @@ class MainWindow(QMainWindow):
         btn_clear_filters.setStyleSheet("margin: 0% 35% 5% 0%")
         btn_clear_filters.clicked.connect(self.__filters.clear_filters)
 
+        self.__filters.teacher_edited.connect(self.suggest_names)
+        self.__filters.changed.connect(self.live_search)
+        self.__last_search = None
+
         btn_show_data = QPushButton("Вивести всі дані")
         btn_show_data.setStyleSheet("margin: 0% auto 5%")
-        btn_show_data.clicked.connect(
-            functools.partial(
-                self.__table.show_data, 
-                self.__db.get_teachers()
-            )
+        btn_show_data.clicked.connect(self.show_all_data)
+
+        self.__show_all = TeachersQuery(
+            self.__db, 
+            page_size=TeachersModel.FETCH_SIZE
         )
 
         btn_layout = QHBoxLayout()
@@ -677,6 +1081,7 @@ class MainWindow(QMainWindow):
 
         maindata.setLayout(layout)
         self.setCentralWidget(maindata)
+        self.__main_view = True
 
     def set_menubar(self):
         menu = self.menuBar()
@@ -696,13 +1101,52 @@ class MainWindow(QMainWindow):
             functools.partial(self.imp_data, imp_csv)
         )
 
+        upd_xlsx = QAction("Оновити з *.xlsx", self)
+        upd_xlsx.setData({"imp": "xlsx", "mode": "sync"})
+        upd_xlsx.triggered.connect(
+            functools.partial(self.imp_data, upd_xlsx)
+        )
+
+        upd_csv = QAction("Оновити з *.csv", self)
+        upd_csv.setData({"imp": "csv", "mode": "sync"})
+        upd_csv.triggered.connect(
+            functools.partial(self.imp_data, upd_csv)
+        )
+
+        imp_dir = QAction("Оновити з теки факультетів", self)
+        imp_dir.triggered.connect(self.imp_dir)
+
+        imp_rollback = QAction("Відкотити останній повний імпорт", self)
+        imp_rollback.triggered.connect(self.rollback_data)
+
         imp_by_hand = QAction("Ввести вручну", self)
         imp_by_hand.triggered.connect(self.set_insertmenu)
 
+        stats = QAction("Статистика", self)
+        stats.triggered.connect(self.set_statsmenu)
+
         imp.addAction(imp_xlsx)
         imp.addSeparator()
         imp.addAction(imp_csv)
         imp.addSeparator()
+
+        for fmt in columnar.FORMATS:
+            imp_col = QAction(f"*.{fmt}", self)
+            imp_col.setData({"imp": fmt})
+            imp_col.triggered.connect(
+                functools.partial(self.imp_data, imp_col)
+            )
+            imp.addAction(imp_col)
+            imp.addSeparator()
+
+        imp.addAction(upd_xlsx)
+        imp.addSeparator()
+        imp.addAction(upd_csv)
+        imp.addSeparator()
+        imp.addAction(imp_dir)
+        imp.addSeparator()
+        imp.addAction(imp_rollback)
+        imp.addSeparator()
         imp.addAction(imp_by_hand)
 
         exp_xlsx = QAction("*.xlsx", self)
@@ -721,6 +1165,15 @@ class MainWindow(QMainWindow):
         exp.addSeparator()
         exp.addAction(exp_csv)
 
+        for fmt in columnar.FORMATS:
+            exp_col = QAction(f"*.{fmt}", self)
+            exp_col.setData({"exp": fmt})
+            exp_col.triggered.connect(
+                functools.partial(self.exp_data, exp_col)
+            )
+            exp.addSeparator()
+            exp.addAction(exp_col)
+
         save_xlsx = QAction("*.xlsx", self)
         save_xlsx.setData({"exp": "xlsx"})
         save_xlsx.triggered.connect(
@@ -736,185 +1189,282 @@ class MainWindow(QMainWindow):
         save.addSeparator()
         save.addAction(save_csv)
 
+        for fmt in columnar.FORMATS:
+            save_col = QAction(f"*.{fmt}", self)
+            save_col.setData({"exp": fmt})
+            save_col.triggered.connect(
+                functools.partial(self.save_data, save_col)
+            )
+            save.addSeparator()
+            save.addAction(save_col)
+
+        menu.addAction(stats)
+
     def imp_data(self, item: QAction):
         dialog = QFileDialog(self)
         url = dialog.getOpenFileName()[0]
         data = item.data()
 
-        try:
-            if data["imp"] == "xlsx":
-                df = pd.read_excel(url)
-            elif data["imp"] == "csv":
-                df = pd.read_csv(url)
+        if len(url.strip()) == 0:
+            return
+
+        self.__tasks.start(
+            import_file,
+            self.__db, 
+            url, 
+            data["imp"], 
+            mode=data.get("mode", "replace"),
+            on_progress=True,
+            on_done=functools.partial(self.imported, data.get("mode")),
+            on_failed=self.import_failed,
+            key="import"
+        )
+
+    def imp_dir(self):
+        url = QFileDialog.getExistingDirectory(self)
+
+        if len(url.strip()) == 0:
+            return
+
+        self.__tasks.start(
+            import_files,
+            self.__db,
+            [url],
+            on_progress=True,
+            on_done=self.imported_files,
+            on_failed=self.import_failed,
+            key="import"
+        )
+
+    def imported_files(self, report: dict):
+        lines = []
+
+        for el in report["files"]:
+            name = os.path.basename(el["file"])
+
+            if el["error"]:
+                lines.append(f"{name}: помилка — {el['error']}")
             else:
-                raise ValueError("Can't parse file (no such format)")
-
-            data = []
-
-            for i in range(len(df)):
-                teacher = str(df.loc[i][1]).strip()
-                fac = str(df.loc[i][2]).strip()
-                gram = str(df.loc[i][3]).strip()
-                state_gram = str(df.loc[i][4]).strip()
-                num_prot = str(df.loc[i][5]).strip()
-                year = str(df.loc[i][6]).strip()
-                state_year = str(df.loc[i][7])
-                prog = str(df.loc[i][8]).strip()
-
-                if not self.__db.check_facs(fac):
-                    raise KeyError(
-                        f"У КПІ не існує такого факультету/ННІ: {fac}"
-                    )
-
-                if (not self.__db.check_kpi_awards(gram) or 
-                    len(gram) == 0):
-                    raise KeyError(
-                        f"У КПІ не існує такої нагороди: {gram}"
-                    )
-
-                if (not self.__db.check_state_awards(state_gram) or 
-                    len(state_gram) == 0):
-                    raise KeyError(
-                        f"Не існує такої державної нагороди: {state_gram}"
-                    )
-
-                gram = re.sub("(`|'|\")", "'", gram)
-                state_gram = re.sub("(`|'|\")", "'", state_gram)
-                prog = (self.__db.get_kpi_award_next({"name": gram}) or
-                        self.__db.get_state_award_next({"name": state_gram}))
-
-                try:
-                    year = str(int(float(year)))
-                except:
-                    pass
-
-                try:
-                    state_year = str(int(float(state_year)))
-                except:
-                    pass
-
-                data.append({
-                    "teacher": teacher,
-                    "fac": fac,
-                    "gram": gram,
-                    "state_gram": state_gram,
-                    "num": num_prot,
-                    "year": year,
-                    "state_year": state_year,
-                    "prog": prog
-                })
-
-            self.__db.set_and_rm_teachers(data)
-            
-        except Exception as ex_:
-            logging.error(ex_)
-
-            if len(url.strip()) > 0:
-                msg = QMessageBox(self)
-                msg.setBaseSize(700, 500)
-                msg.setWindowTitle("Помилка!")
-                msg.setText(
-                    "Неможливо розпарсити файл. "
-                    "Оберіть інший формат файла або "
-                    "спробуйте перетягти таблицю у позицію A1 та "
-                    "сформувати поля таким чином: №, "
-                    "Прізвище, ім'я, по-батькові співробітника, "
-                    "Факультет/ННІ, "
-                    "Нагорода (Почесне звання, відзнака та грамота), "
-                    "№ Протоколу ВР КПІ ім. Ігоря "
-                    "Сікорського про відзнічення, "
-                    "Рік відзначення КПІ, "
-                    "Рік призначення державою, "
-                    "Прогнозування."
+                lines.append(
+                    f"{name}: {el['rows']} записів ({el['seconds']} с)"
                 )
-                msg.show()
 
+        if report["counts"]:
+            self.__last_search = None
+
+            if self.__main_view:
+                self.show_all_data()
+
+            lines.append("")
+            lines.append(
+                f"Додано: {report['counts']['inserted']}, "
+                f"оновлено: {report['counts']['updated']}, "
+                f"видалено: {report['counts']['deleted']}, "
+                f"без змін: {report['counts']['unchanged']}"
+            )
+        else:
+            lines.append("Дані не змінено")
+
+        self.show_message("Імпорт завершено", "\n".join(lines))
+
+    def imported(self, mode: str, counts: dict):
+        self.__last_search = None
+
+        if self.__main_view:
+            self.show_all_data()
+
+        if mode == "sync":
+            self.show_message(
+                "Імпорт завершено",
+                f"Додано: {counts['inserted']}, "
+                f"оновлено: {counts['updated']}, "
+                f"видалено: {counts['deleted']}, "
+                f"без змін: {counts['unchanged']}"
+            )
+
+    def import_failed(self, ex_: Exception):
+        if isinstance(ex_, (ImportError, ImportLocked, SchemaOutdated)):
+            self.show_message("Помилка!", str(ex_))
+            return
+
+        self.show_message(
+            "Помилка!",
+            "Неможливо розпарсити файл. "
+            "Оберіть інший формат файла або "
+            "спробуйте перетягти таблицю у позицію A1 та "
+            "сформувати поля таким чином: №, "
+            "Прізвище, ім'я, по-батькові співробітника, "
+            "Факультет/ННІ, "
+            "Нагорода (Почесне звання, відзнака та грамота), "
+            "№ Протоколу ВР КПІ ім. Ігоря "
+            "Сікорського про відзнічення, "
+            "Рік відзначення КПІ, "
+            "Рік призначення державою, "
+            "Прогнозування."
+        )
+
+    def rollback_data(self):
+        answer = QMessageBox.question(
+            self,
+            "Відкат імпорту",
+            "Відновити дані, що були до останнього повного імпорту? "
+            "Усі пізніші зміни буде втрачено."
+        )
+
+        if answer != QMessageBox.Yes:
             return
 
-        self.__table.show_data(self.__db.get_teachers())
+        self.__tasks.start(
+            self.__db.rollback_teachers,
+            on_done=lambda _: self.imported(None, {}),
+            on_failed=lambda ex_: self.show_message("Помилка!", str(ex_)),
+            key="import"
+        )
 
-    def exp_data(self, item: QAction, teachers: typing.List[dict] = None):
+    def exp_data(self, item: QAction, filters: dict = None):
         dialog = QFileDialog(self)
         url = dialog.getSaveFileName()[0]
         data = item.data()
 
+        if len(url.strip()) == 0:
+            return
+
+        self.__tasks.start(
+            export_file,
+            self.__db,
+            url,
+            data["exp"],
+            filters,
+            on_failed=self.export_failed,
+            key="export"
+        )
+
+    def export_failed(self, ex_: Exception):
+        if isinstance(ex_, ImportError):
+            self.show_message("Помилка!", str(ex_))
+            return
+
+        self.show_message(
+            "Помилка!",
+            "Неможливо сформувати файл. "
+            "Спробуйте обрати інше розширення, формат або "
+            "внесіть дані, щоб їх імпортувати."
+        )
+
+    def search_data(self):
+        self.run_search(False)
+
+    def live_search(self):
+        self.run_search(True)
+
+    def run_search(self, live: bool):
+        form = {}
+        form = self.__filters.get_filters(form)
+
         try:
-            teachers = [el for el in (teachers or self.__db.get_teachers())]
-        except:
-            msg = QMessageBox(self)
-            msg.setBaseSize(700, 500)
-            msg.setWindowTitle("Помилка!")
-            msg.setText(
-                "Нема даних, які можна було експортувати."
+            filters = compile_filters(form)
+        except ValueError as ex_:
+            if not live:
+                self.show_message("Помилка!", str(ex_))
+            return
+
+        query = TeachersQuery(
+            self.__db, 
+            filters, 
+            page_size=TeachersModel.FETCH_SIZE
+        )
+        last = self.__last_search
+
+        if live and last and is_refinement(last[0], form):
+            items = [el for el in last[1] if match_filters(filters, el)]
+
+            self.__tasks.cancel("search")
+            self.__last_search = (form, items)
+            self.show_result(
+                {"items": items, "token": None, "total": len(items)},
+                query
             )
-            msg.show()
-        
-        for el in teachers:
-            el["gram"] = re.sub("'", "`", el["gram"])
-            el["state_gram"] = re.sub("'", "`", el["state_gram"])
-            try:
-                el.pop("_id")
-            except:
-                pass
-        
-        teachers = re.sub("'", '"', str(teachers))
+            return
 
-        try:
-            df = pd.read_json(teachers)
-            df.rename(columns={
-                "teacher": "Прізвище, ім'я, по-батькові співробітника",
-                "fac": "Факультет/ННІ",
-                "gram": "Нагорода (Почесне звання, відзнака та грамота)",
-                "state_gram": "Державна нагорода",
-                "num": ("№ Протоколу ВР КПІ ім. Ігоря "
-                        "Сікорського про відзнічення"),
-                "year": "Рік відзначення КПІ",
-                "state_year": "Рік призначення державою",
-                "prog": "Прогнозування"
-            }, inplace=True)
-
-            if data["exp"] == "xlsx":
-                df.to_excel(url)
-            elif data["exp"] == "csv":
-                df.to_csv(url)
-            else:
-                raise ValueError("Can't parse file (no such format)")
-        except Exception as ex_:
-            logging.error(ex_)
-
-            if len(url.strip()) > 0:
-                msg = QMessageBox(self)
-                msg.setBaseSize(700, 500)
-                msg.setWindowTitle("Помилка!")
-                msg.setText(
-                    "Неможливо сформувати файл. "
-                    "Спробуйте обрати інше розширення, формат або "
-                    "внесіть дані, щоб їх імпортувати."
-                )
-                msg.show()
+        self.__tasks.start(
+            query.page,
+            on_done=functools.partial(self.searched, form, query),
+            on_failed=self.search_failed,
+            key="search"
+        )
 
+    def searched(self, form: dict, query: TeachersQuery, page: dict):
+        if page["token"] is None:
+            self.__last_search = (form, page["items"])
+        else:
+            self.__last_search = None
+
+        self.show_result(page, query)
+
+    def show_all_data(self):
+        self.__tasks.start(
+            self.__show_all.page,
+            on_done=functools.partial(
+                self.show_result, 
+                query=self.__show_all
+            ),
+            on_failed=self.search_failed,
+            key="search"
+        )
+
+    def suggest_names(self, text: str):
+        if len(text.strip()) < 3:
             return
 
-    def search_data(self):
-        filters = {}
-        filters = self.__filters.get_filters(filters)
+        self.__tasks.start(
+            self.__db.find_teacher_names,
+            text,
+            on_done=self.__filters.set_suggestions,
+            key="names"
+        )
 
-        data = self.__db.get_teachers(filters)
+    def show_result(self, page: dict, query: TeachersQuery = None):
+        if not self.__main_view:
+            return
 
-        self.__table.show_data(data)
+        self.__table.show_data(page, query)
+
+        if page["total"] is not None:
+            self.statusBar().showMessage(
+                f"Знайдено записів: {page['total']}"
+            )
+
+    def search_failed(self, ex_: Exception):
+        self.show_message("Помилка!", "Не вдалося отримати дані з БД.")
 
     def save_data(self, item):
-        data = self.__table.temp_data
-        self.exp_data(item, data)
+        self.exp_data(item, self.__table.filters or {})
+
+    def fetch_catalogs(self) -> tuple:
+        return (
+            list(self.__db.get_facs()),
+            list(self.__db.get_kpi_awards()),
+            list(self.__db.get_state_awards())
+        )
 
     def set_insertmenu(self):
-        self.__toinsert = WindowToInsertData(
-            self, 
-            self.__db.get_facs(),
-            self.__db.get_kpi_awards(),
-            self.__db.get_state_awards()
+        self.__tasks.start(
+            self.fetch_catalogs,
+            on_done=self.show_insertmenu,
+            on_failed=self.search_failed,
+            key="menu"
         )
 
+    def show_insertmenu(self, catalogs: tuple):
+        self.__tasks.cancel("search")
+        self.__tasks.cancel("names")
+        self.__main_view = False
+        self.__toinsert = WindowToInsertData(self, *catalogs)
+
+        queue = QPushButton("Додати до черги")
+        queue.setStyleSheet("min-width: 150px")
+        queue.clicked.connect(self.queue_entry)
+
         insert = QPushButton("Внести дані")
         insert.setStyleSheet("min-width: 150px")
         insert.clicked.connect(self.insert_into_db)
@@ -933,6 +1483,7 @@ class MainWindow(QMainWindow):
         menu.clear()
 
         layout_row_btn = QHBoxLayout()
+        layout_row_btn.addWidget(queue)
         layout_row_btn.addWidget(insert)
         layout_row_btn.addWidget(remove)
 
@@ -949,70 +1500,96 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(data)
 
-    def insert_into_db(self):
-        data = self.__toinsert.get_data()
+    def set_statsmenu(self):
+        form = {}
+        form = self.__filters.get_filters(form)
 
-        if len(data["teacher"]) == 0:
-            self.__toinsert.show_status(
-                "Помилка: потрібно внести ПІБ викладача",
-                "red"
-            )
+        try:
+            filters = compile_filters(form)
+        except ValueError as ex_:
+            self.show_message("Помилка!", str(ex_))
             return
 
-        l_gram = len(data["gram"])
-        l_sgram = len(data["state_gram"])
+        self.__tasks.start(
+            self.__db.get_stats,
+            filters,
+            on_done=self.show_statsmenu,
+            on_failed=self.search_failed,
+            key="menu"
+        )
 
-        if l_gram > 0 and l_sgram > 0:
-            self.__toinsert.show_status(
-                "Помилка: можна вносити лише одну нагороду",
-                "red"
-            )
-            return
-        elif l_gram <= 0 and l_sgram <= 0:
-            self.__toinsert.show_status(
-                "Помилка: потрібно внести нагороду",
-                "red"
-            )
+    def show_statsmenu(self, stats: dict):
+        self.__tasks.cancel("search")
+        self.__tasks.cancel("names")
+        self.__main_view = False
 
-        l_year = len(data["year"])
-        l_syear = len(data["state_year"])
+        total = QLabel(self)
+        total.setText(f"Всього записів: {stats['total']}")
 
-        if l_year > 0 and l_syear > 0:
-            self.__toinsert.show_status(
-                "Помилка: можна вносити лише один рік",
-                "red"
-            )
-            return
-        elif l_year <= 0 and l_syear <= 0:
-            self.__toinsert.show_status(
-                "Помилка: потрібно внести рік",
-                "red"
-            )
+        exit = QPushButton("Повернутися")
+        exit.setStyleSheet("min-width: 300px")
+        exit.clicked.connect(self.return_to_mainmenu)
+
+        menu = self.menuBar()
+        menu.clear()
+
+        container = QVBoxLayout()
+        container.addWidget(total)
+        container.addWidget(Statistics(self, stats))
+        container.addWidget(exit)
+
+        data = QWidget(self)
+        data.setLayout(container)
+
+        self.setCentralWidget(data)
+
+    def queue_entry(self) -> bool:
+        error = self.__toinsert.add_pending()
+
+        if error:
+            self.__toinsert.show_status(error, "red")
+            return False
+
+        self.__toinsert.show_status("Запис додано до черги", "green")
+        self.__toinsert.clear_data(False)
+
+        return True
+
+    def insert_into_db(self):
+        if self.__toinsert.get_data()["teacher"] and not self.queue_entry():
             return
 
-        if ((l_gram > 0 and l_syear > 0) or
-            (l_sgram > 0 and l_year > 0)):
-            self.__toinsert.show_status(
-                "Помилка: потрібно внести нагороду й рік її отримання"
-                "або від КПІ, або від держави",
-                "red"
-            )
+        rows = self.__toinsert.get_pending()
+
+        if not rows:
             return
 
-        try:
-            self.__db.set_teacher(data)
-        except Exception as ex_:
-            self.__toinsert.show_status(ex_.args, "red")
-        else:
-            self.__toinsert.show_status("Дані були внесені", "green")
+        self.__tasks.start(
+            self.__db.set_teachers,
+            rows,
+            on_done=functools.partial(self.inserted, rows),
+            on_failed=self.insert_failed,
+            key="insert"
+        )
 
-        self.__toinsert.clear_data(False)
+    def inserted(self, rows: typing.List[dict], statuses: typing.List[dict]):
+        self.__toinsert.show_statuses(rows, statuses)
+        self.__toinsert.set_pending([
+            row for row, status in zip(rows, statuses) 
+            if status["status"] != "inserted"
+        ])
+
+    def insert_failed(self, ex_: Exception):
+        self.__toinsert.show_status(str(ex_), "red")
 
     def return_to_mainmenu(self):
+        self.__tasks.cancel("menu")
+        self.__tasks.cancel("insert")
         self.set_menubar()
         self.set_mainmenu()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     app = QApplication(sys.argv)
 
     window = MainWindow()
@@ -0,0 +1,42 @@
+import argparse
+import logging
+import sys
+
+from database import DataBase, SCHEMA_VERSION
+
+parser = argparse.ArgumentParser(
+    description="Міграція колекції teachers до актуальної схеми даних"
+)
+parser.add_argument("--host", default="localhost")
+parser.add_argument("--port", type=int, default=27017)
+parser.add_argument("--db", default="teacher_awards")
+parser.add_argument("--dry-run", action="store_true")
+parser.add_argument(
+    "--rebuild", 
+    action="store_true",
+    help="перебудувати faculty_summary та forecasts"
+)
+args = parser.parse_args()
+
+db = DataBase(args.host, args.port, args.db)
+
+if args.rebuild:
+    print(f"faculty_summary: {db.rebuild_summary()} факультетів")
+    print(f"forecasts: {db.rebuild_forecasts()} викладачів")
+    sys.exit(0)
+
+version = db.schema_version()
+
+if version >= SCHEMA_VERSION:
+    print(f"Схема даних вже актуальна (v{version})")
+    sys.exit(0)
+
+try:
+    done = db.migrate(dry_run=args.dry_run)
+except ValueError as ex_:
+    logging.error(ex_)
+    print(f"Міграцію перервано, невідомі значення:\n{ex_}")
+    sys.exit(1)
+
+for target, count in done.items():
+    print(f"v{target}: {count} документів")
@@ -0,0 +1,101 @@
+import collections
+import re
+import threading
+import typing
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d",
+    "е": "e", "є": "ie", "ж": "zh", "з": "z", "и": "y", "і": "i",
+    "ї": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ь": "", "ю": "iu", "я": "ia", "ё": "e", "ы": "y", "э": "e", "ъ": "",
+}
+
+FOLD = (("kh", "h"), ("g", "h"), ("y", "i"), ("j", "i"), ("w", "v"))
+
+APOSTROPHES = re.compile("['`’ʼ\"]")
+
+def normalize(name: str) -> str:
+    name = APOSTROPHES.sub("", name.casefold())
+    name = "".join(TRANSLIT.get(ch, ch) for ch in name)
+
+    for old, new in FOLD:
+        name = name.replace(old, new)
+
+    name = re.sub(r"(.)\1+", r"\1", name)
+
+    return " ".join(re.sub("[^a-z]+", " ", name).split())
+
+def trigrams(name: str) -> typing.Set[str]:
+    grams = set()
+
+    for word in normalize(name).split():
+        word = f"  {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+
+    return grams
+
+class NameIndex:
+    def __init__(self, names: typing.Iterable[str] = ()):
+        self.__lock = threading.Lock()
+        self.__names = []
+        self.__ids = {}
+        self.__grams = []
+        self.__postings = collections.defaultdict(set)
+
+        self.add(names)
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def add(self, names: typing.Iterable[str]):
+        with self.__lock:
+            for name in names:
+                if not name or name in self.__ids:
+                    continue
+
+                idx = len(self.__names)
+                grams = trigrams(name)
+
+                self.__names.append(name)
+                self.__ids[name] = idx
+                self.__grams.append(grams)
+
+                for gram in grams:
+                    self.__postings[gram].add(idx)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        threshold: float = 0.5
+    ) -> typing.List[typing.Tuple[str, float]]:
+        grams = trigrams(query)
+
+        if not grams:
+            return []
+
+        with self.__lock:
+            shared = collections.Counter()
+
+            for gram in grams:
+                shared.update(self.__postings.get(gram, ()))
+
+            found = []
+
+            for idx, count in shared.items():
+                cover = count / len(grams)
+
+                if cover < threshold:
+                    continue
+
+                dice = 2 * count / (len(grams) + len(self.__grams[idx]))
+                found.append((cover, dice, self.__names[idx]))
+
+        found.sort(key=lambda el: (-el[0], -el[1], el[2]))
+
+        return [
+            (name, round((cover + dice) / 2, 3))
+            for cover, dice, name in found[:limit]
+        ]